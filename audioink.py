@@ -1,16 +1,47 @@
 import streamlit as st
-import requests
 import os
+import queue
+import time
+import uuid
 from io import BytesIO
-from pydub import AudioSegment
-from pydub.utils import which
 from PIL import Image
-import re
+from transcriber import (
+    ADAPTIVE_TUNING,
+    COMPRESSED_BITRATE,
+    COMPRESSED_FORMAT,
+    COMPRESSED_SAMPLE_RATE,
+    MAX_UPLOAD_SIZE,
+    MAX_WORKERS,
+    SUPPORTED_FORMATS,
+    VAD_ENABLED,
+    audio_segment,
+    clean_transcription,
+    configure,
+    decode_audio,
+    get_fallback_policy,
+    get_request_scheduler,
+    get_search_index,
+    get_tuner,
+    get_whisper_client,
+    index_transcript,
+    prepare_chunks,
+    split_audio,
+    spool_upload,
+    transcribe_audio,
+    transcribe_chunks,
+    transcribe_file,
+    validate_file
+)
+from live_transcription import RollingWindowTranscriber
+from batch import build_archive, expand_uploads, run_batch
+from jobs import JobManager
+from metrics import REGISTRY, stage_summary, start_http_server
 
-# Set FFmpeg paths automatically
-AudioSegment.converter = which("ffmpeg")
-AudioSegment.ffmpeg = which("ffmpeg")
-AudioSegment.ffprobe = which("ffprobe")
+# Microphone streaming for live transcription is optional
+try:
+    from streamlit_webrtc import WebRtcMode, webrtc_streamer
+except ImportError:
+    webrtc_streamer = None
 
 # Page Config
 st.set_page_config(page_title="AudioInk", page_icon="🎙️", layout="wide")
@@ -202,145 +233,401 @@ def local_css():
     </style>
     """, unsafe_allow_html=True)
 
+def secret_flag(name, default):
+    """
+    Read an on/off secret the way transcriber reads environment flags, so
+    a string like "off" or "false" turns it off.
+
+    Args:
+        name (str): Secret name
+        default (bool): Value when the secret isn't set
+
+    Returns:
+        bool: Whether the flag is on
+    """
+    value = st.secrets.get(name)
+    if value is None:
+        return default
+    return str(value).lower() in ("1", "true", "yes", "on")
+
 # API Configuration
-AZURE_WHISPER_API_URL = st.secrets.get("AZURE_WHISPER_API_URL", "https://your-api-endpoint.azure.com")
-API_KEY = st.secrets.get("AZURE_API_KEY", "your_api_key_here")
-SUPPORTED_FORMATS = ["mp3", "mp4", "mpeg", "mpga", "m4a", "wav", "webm"]
-MAX_FILE_SIZE = 25 * 1024 * 1024
+configure(
+    api_url=st.secrets.get("AZURE_WHISPER_API_URL", "https://your-api-endpoint.azure.com"),
+    api_key=st.secrets.get("AZURE_API_KEY", "your_api_key_here"),
+    endpoints=[dict(endpoint) for endpoint in st.secrets.get("WHISPER_ENDPOINTS", [])],
+    upload_encoding=st.secrets.get("UPLOAD_ENCODING", "auto"),
+    cache_dir=st.secrets.get("CACHE_DIR", os.path.expanduser("~/.cache/audioink")),
+    vad_enabled=secret_flag("VAD_ENABLED", VAD_ENABLED),
+    requests_per_minute=st.secrets.get("REQUESTS_PER_MINUTE", 0),
+    audio_seconds_per_minute=st.secrets.get("AUDIO_SECONDS_PER_MINUTE", 0),
+    spool_threshold=int(st.secrets.get("SPOOL_THRESHOLD", 8 * 1024 * 1024)),
+    spool_dir=st.secrets.get("SPOOL_DIR", ""),
+    search_index_path=st.secrets.get("SEARCH_INDEX_PATH"),
+    backend=st.secrets.get("TRANSCRIPTION_BACKEND", "remote"),
+    fallback_backend=st.secrets.get("FALLBACK_BACKEND", "local"),
+    local_quality=st.secrets.get("LOCAL_QUALITY", "balanced"),
+    local_model_dir=st.secrets.get("LOCAL_MODEL_DIR", ""),
+    adaptive_tuning=secret_flag("ADAPTIVE_TUNING", ADAPTIVE_TUNING),
+    tuning_log_path=st.secrets.get("TUNING_LOG_PATH")
+)
+
+# Batch mode, and the most audio a batch may expand to once zips are unpacked
+BATCH_CONVERT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+BATCH_MAX_BYTES = 1024 * 1024 * 1024
+
+# Background transcription jobs shared by all sessions
+JOB_WORKERS = 4
+
+# Metrics: Prometheus endpoint (0 disables it) and the in-app debug panel
+METRICS_PORT = int(st.secrets.get("METRICS_PORT", 0))
+DEBUG_PANEL = secret_flag("DEBUG_PANEL", False)
+# Hits shown when searching past transcripts
+SEARCH_RESULTS = 20
+
+# Start work on an upload before the button is pressed: "off", "convert"
+# (conversion and chunking only) or "transcribe" (the whole pipeline,
+# spending API quota on files that may never be submitted)
+PREFETCH = st.secrets.get("PREFETCH", "off")
 
-def clean_transcription(text):
+# Live transcription windows
+LIVE_WINDOW_MS = 6000
+LIVE_OVERLAP_MS = 1500
+LIVE_WORKERS = 2
+
+def session_id():
+    """Identifier the request scheduler shares API quota out by."""
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+def new_live_transcriber():
+    session = session_id()
+    return RollingWindowTranscriber(
+        lambda window: transcribe_audio(window, clean=False, session=session),
+        window_ms=LIVE_WINDOW_MS,
+        overlap_ms=LIVE_OVERLAP_MS,
+        max_workers=LIVE_WORKERS
+    )
+
+def run_live_transcription():
     """
-    Clean up transcription text by removing unwanted symbols and fixing formatting.
+    Stream microphone audio through rolling windows while the user speaks.
     
-    Args:
-        text (str): The raw transcription text from the API
-        
     Returns:
-        str: Cleaned and formatted text
+        str: The cleaned transcript so far, or None before anything was said
     """
-    if not text:
-        return ""
-        
-    # 1. Remove common transcription artifacts and symbols
-    # Common musical note symbols, bullets, etc.
-    symbols_to_remove = ['♪', '•', '¶', '§', '†', '‡', '©', '®', '™', '℠', '℗', '〈', '〉', '⟨', '⟩']
-    for symbol in symbols_to_remove:
-        text = text.replace(symbol, '')
-    
-    # 2. Remove speaker annotations like [Speaker 1]:
-    text = re.sub(r'\[\w+\s*\d*\]:', '', text)
-    
-    # 3. Remove timestamps like [00:15] or (00:15)
-    text = re.sub(r'[\[\(]\d+:\d+[\]\)]', '', text)
+    ctx = webrtc_streamer(
+        key="live-capture",
+        mode=WebRtcMode.SENDONLY,
+        audio_receiver_size=1024,
+        media_stream_constraints={"video": False, "audio": True}
+    )
+    placeholder = st.empty()
     
-    # 4. Keep only alphanumeric characters, spaces, and basic punctuation
-    text = re.sub(r'[^\w\s.,?!\'"-]', '', text)
+    if ctx.state.playing:
+        live = new_live_transcriber()
+        st.session_state.live_transcript = None
+        stitched = ""
+        try:
+            while ctx.state.playing:
+                try:
+                    frames = ctx.audio_receiver.get_frames(timeout=1)
+                except queue.Empty:
+                    continue
+                for frame in frames:
+                    live.feed(audio_segment()(
+                        data=frame.to_ndarray().tobytes(),
+                        sample_width=frame.format.bytes,
+                        frame_rate=frame.sample_rate,
+                        channels=len(frame.layout.channels)
+                    ))
+                # Clean and redraw only when a window was stitched on
+                raw_transcript = live.poll()
+                if raw_transcript != stitched:
+                    stitched = raw_transcript
+                    # Survives the rerun Streamlit starts when recording stops
+                    st.session_state.live_transcript = clean_transcription(stitched)
+                    placeholder.markdown(st.session_state.live_transcript)
+        finally:
+            # Stopping may interrupt the loop with Streamlit's rerun, so the
+            # last partial window and any still in flight are stitched here
+            live.flush()
+            raw_transcript = live.close()
+            if raw_transcript != stitched:
+                st.session_state.live_transcript = clean_transcription(raw_transcript)
     
-    # 5. Replace multiple spaces with a single space
-    text = re.sub(r'\s+', ' ', text)
+    return st.session_state.get("live_transcript")
+
+def transcribe_progressively(audio_file, placeholder):
+    """
+    Transcribe a finished recording window by window, showing partial text.
     
-    # 6. Remove any repeated punctuation
-    text = re.sub(r'([.,?!]){2,}', r'\1', text)
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        placeholder: Streamlit container updated with the text so far
+        
+    Returns:
+        tuple: (success, cleaned transcription or error message)
+    """
+    try:
+        live = new_live_transcriber()
+        live.feed(decode_audio(audio_file))
+        live.flush()
+        while live.pending:
+            placeholder.markdown(clean_transcription(live.poll()) or "Listening...")
+            time.sleep(0.2)
+        raw_transcription = live.close()
+        placeholder.empty()
+        if live.errors:
+            return False, live.errors[0]
+        return True, clean_transcription(raw_transcription)
+    except Exception as e:
+        return False, f"Transcription error: {str(e)}"
+
+@st.cache_resource
+def get_job_manager():
+    return JobManager(max_workers=JOB_WORKERS)
+
+def upload_key(audio_file):
+    return getattr(audio_file, "file_id", None) or f"{audio_file.name}:{audio_file.size}"
+
+def start_prefetch(audio_file):
+    """Start converting, or transcribing, an upload as soon as it lands."""
+    key = upload_key(audio_file)
+    prefetch = st.session_state.get("prefetch")
+    if prefetch is not None and prefetch["key"] == key:
+        return
+    cancel_prefetch()
     
-    # 7. Fix common transcription errors
-    common_fixes = {
-        "i m ": "I'm ",
-        "dont ": "don't ",
-        "cant ": "can't ",
-        "wont ": "won't ",
-        "im ": "I'm ",
-        "Id ": "I'd ",
-        "Ill ": "I'll ",
-        "lets ": "let's ",
-        "its ": "it's ",
-        # Add more as needed
-    }
+    job_audio = spool_upload(audio_file)
+    if PREFETCH == "transcribe":
+        session = session_id()
+        work = lambda job: transcribe_file(
+            job_audio, on_stage=job.set_stage, session=session, timestamps=True, name=audio_file.name
+        )
+    else:
+        work = lambda job: prepare_chunks(job_audio, on_stage=job.set_stage)
+    st.session_state.prefetch = {"key": key, "audio": job_audio, "job_id": get_job_manager().submit(work)}
+
+def cancel_prefetch():
+    prefetch = st.session_state.pop("prefetch", None)
+    if prefetch is not None and prefetch["job_id"] is not None:
+        get_job_manager().cancel(prefetch["job_id"])
+
+def start_transcription_job(audio_file):
+    job_manager = get_job_manager()
+    prefetch = st.session_state.get("prefetch")
+    # Kept, without a job, so reruns with the same upload don't prefetch it again
+    st.session_state.prefetch = {"key": upload_key(audio_file), "audio": None, "job_id": None}
+    prefetch_job = None
+    if prefetch is not None and prefetch["job_id"] is not None:
+        if prefetch["key"] == upload_key(audio_file):
+            prefetch_job = job_manager.get(prefetch["job_id"])
+        else:
+            job_manager.cancel(prefetch["job_id"])
+    if prefetch_job is not None and prefetch_job.status == "queued":
+        # Nothing to pick up yet, and waiting on it from another worker
+        # could deadlock a full pool
+        job_manager.cancel(prefetch["job_id"])
+        prefetch_job = None
     
-    for original, replacement in common_fixes.items():
-        text = text.replace(original, replacement)
+    if prefetch_job is not None and PREFETCH == "transcribe":
+        # Already under way, or even finished
+        st.session_state.job_id = prefetch["job_id"]
+    else:
+        if prefetch_job is not None:
+            # Pick up the converted chunks, waiting for them if need be
+            job_audio = prefetch["audio"]
+            prepared = prefetch_job.result
+            job_manager.discard(prefetch["job_id"])
+        else:
+            # The job gets its own copy so reruns can't move its read position.
+            # Large uploads are copied to a temp file that goes away with the job
+            job_audio = spool_upload(audio_file)
+            prepared = None
+        session = session_id()
+        st.session_state.job_id = job_manager.submit(
+            lambda job: transcribe_file(
+                job_audio, on_stage=job.set_stage, session=session, timestamps=True, prepared=prepared,
+                name=audio_file.name
+            )
+        )
+    st.session_state.transcription_result = None
+    st.session_state.transcript = None
+
+@st.fragment(run_every=1)
+def show_job_progress(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None or job.status in ("done", "failed", "cancelled"):
+        # Rerun the whole page so the result is picked up
+        st.rerun()
     
-    # 8. Fix capitalization
-    # Capitalize first letter of sentences
-    sentences = re.split(r'([.!?]\s+)', text)
-    result = ""
+    if job.status == "queued":
+        waiting = get_job_manager().queue_depth()
+        st.info(f"Waiting for a free worker ({waiting} in queue)...")
+        return
     
-    for i in range(0, len(sentences), 2):
-        if i < len(sentences):
-            # Capitalize first letter of sentence if it exists and has content
-            if sentences[i] and len(sentences[i]) > 0:
-                sentences[i] = sentences[i][0].upper() + sentences[i][1:]
-            
-            # Add the sentence
-            result += sentences[i]
-            
-            # Add the separator (period, exclamation mark, etc.) if it exists
-            if i + 1 < len(sentences):
-                result += sentences[i + 1]
+    scheduler = get_request_scheduler()
+    wait = scheduler.estimated_wait(session=session_id())
+    if wait >= 1:
+        st.info(f"{job.stage} Waiting for API quota, about {wait:.0f}s "
+                f"({scheduler.queue_depth()} requests queued)...")
+    else:
+        st.info(job.stage)
+
+def collect_job_result():
+    """
+    Move a finished background job's result into the session.
     
-    # Always capitalize 'I'
-    result = re.sub(r'\bi\b', 'I', result)
+    Shows the job's progress instead while it is still running.
+    """
+    job_id = st.session_state.get("job_id")
+    if not job_id:
+        return
     
-    return result.strip()
+    job_manager = get_job_manager()
+    job = job_manager.get(job_id)
+    if job is None:
+        del st.session_state.job_id
+        st.error("Transcription job expired, please try again.")
+    elif job.status == "done":
+        del st.session_state.job_id
+        job_manager.discard(job_id)
+        success, result = job.result()
+        if success:
+            # Keep the timed transcript for the subtitle and JSON exports
+            st.session_state.transcript = result
+            st.session_state.transcription_result = result.text
+        else:
+            st.error(result)
+    elif job.status == "failed":
+        del st.session_state.job_id
+        job_manager.discard(job_id)
+        st.error(f"Transcription error: {str(job.future.exception())}")
+    elif job.status == "cancelled":
+        del st.session_state.job_id
+        job_manager.discard(job_id)
+        st.error("Transcription job was cancelled, please try again.")
+    else:
+        show_job_progress(job_id)
 
-def transcribe_audio(audio_file):
-    headers = {
-        "api-key": API_KEY, 
-        "Authorization": f"Bearer {API_KEY}"
-    }
-    try:
-        audio_file.seek(0)
-        files = {"file": (audio_file.name, audio_file, "audio/wav")}
-        
-        with st.spinner("Transcribing audio..."):
-            response = requests.post(
-                AZURE_WHISPER_API_URL, 
-                headers=headers, 
-                files=files, 
-                timeout=60
-            )
-            
-            if response.status_code == 200:
-                raw_transcription = response.json().get("text", "No text returned")
-                
-                # Apply the cleaning function to remove unwanted symbols
-                cleaned_transcription = clean_transcription(raw_transcription)
-                
-                return True, cleaned_transcription
-            else:
-                return False, f"API Error: {response.status_code} - {response.text}"
-    except Exception as e:
-        return False, f"Transcription error: {str(e)}"
+@st.cache_resource
+def start_metrics_endpoint(port):
+    return start_http_server(port)
 
-def validate_file(file):
-    if not file:
-        return False, "No file uploaded."
-    if file.size > MAX_FILE_SIZE:
-        return False, "File too large. Max size is 25MB."
-    if file.name.split(".")[-1].lower() not in SUPPORTED_FORMATS:
-        return False, "Unsupported file format."
-    return True, "File is valid."
+def render_debug_panel():
+    with st.expander("Debug metrics"):
+        summary = stage_summary()
+        if summary:
+            st.dataframe(summary, use_container_width=True)
+        else:
+            st.caption("No pipeline stages have run yet.")
+        st.json({
+            "api": get_whisper_client().stats(),
+            "scheduler": get_request_scheduler().stats(),
+            "fallback": get_fallback_policy().stats(),
+            "tuning": get_tuner().stats()
+        })
+        decisions = get_tuner().recent_decisions()
+        if decisions:
+            st.caption("Recent tuning decisions")
+            st.dataframe(decisions[::-1], use_container_width=True)
+        st.download_button(
+            label="Download metrics",
+            data=REGISTRY.render(),
+            file_name="metrics.txt",
+            mime="text/plain"
+        )
 
-def convert_to_wav(audio_file):
-    try:
-        file_extension = audio_file.name.split(".")[-1].lower()
-        if file_extension == "wav":
-            return audio_file
-        audio_bytes = audio_file.read()
-        audio_file.seek(0)
-        audio = AudioSegment.from_file(BytesIO(audio_bytes), format=file_extension)
-        wav_io = BytesIO()
-        audio.export(wav_io, format="wav")
-        wav_io.seek(0)
-        wav_io.name = f"{os.path.splitext(audio_file.name)[0]}.wav"
-        return wav_io
-    except Exception as e:
-        st.error(f"Error converting audio: {str(e)}")
-        return None
+def render_search_panel():
+    index = get_search_index()
+    if index is None:
+        return
+    with st.expander("Search past transcripts"):
+        query = st.text_input(
+            "Search", key="search_query", placeholder='Words, "exact phrases" or prefixes*',
+            label_visibility="collapsed"
+        )
+        if not query:
+            return
+        hits = index.search(query, limit=SEARCH_RESULTS)
+        if not hits:
+            st.caption("No matches.")
+        for hit in hits:
+            when = time.strftime("%Y-%m-%d", time.localtime(hit.created))
+            where = f" at {int(hit.start // 60)}:{int(hit.start % 60):02d}" if hit.start is not None else ""
+            st.markdown(f"**{hit.name}**{where} · {when}  \n{hit.snippet}")
+
+def transcribe_batch_item(upload_file, name, session):
+    success, result = transcribe_chunks(split_audio(upload_file), session)
+    if success:
+        index_transcript(upload_file, result, name=os.path.basename(name))
+    return success, result
+
+def render_batch_mode():
+    uploaded_files = st.file_uploader(
+        "Drag and drop audio files or a zip archive",
+        type=SUPPORTED_FORMATS + ["zip"],
+        accept_multiple_files=True,
+        key="batch_uploader"
+    )
+    if not uploaded_files:
+        return
+    
+    if st.button("🎧 Transcribe All", key="batch_transcribe", use_container_width=True, type="primary"):
+        items = []
+        for name, data in expand_uploads(uploaded_files, SUPPORTED_FORMATS, MAX_UPLOAD_SIZE, BATCH_MAX_BYTES):
+            if data is None:
+                st.warning(f"Skipping {name}: file too large. Max size is 200MB, and 1GB for the whole batch.")
+            else:
+                items.append((name, data))
+        if not items:
+            st.error("No supported audio files found.")
+            return
+        
+        progress_bar = st.progress(0.0, text=f"0/{len(items)} files")
+        status_box = st.empty()
+        statuses = ["queued"] * len(items)
+        
+        def on_progress(index, status):
+            statuses[index] = status
+            finished = sum(status in ("done", "failed") for status in statuses)
+            progress_bar.progress(finished / len(items), text=f"{finished}/{len(items)} files")
+            status_box.markdown("\n".join(
+                f"- {name}: {status}" for (name, _), status in zip(items, statuses)
+            ))
+        
+        session = session_id()
+        results = run_batch(
+            items,
+            lambda upload_file, name: transcribe_batch_item(upload_file, name, session),
+            output_format=COMPRESSED_FORMAT,
+            sample_rate=COMPRESSED_SAMPLE_RATE,
+            bitrate=COMPRESSED_BITRATE,
+            convert_workers=BATCH_CONVERT_WORKERS,
+            api_workers=MAX_WORKERS,
+            on_progress=on_progress
+        )
+        for name, success, message in results:
+            if not success:
+                st.error(f"{name}: {message}")
+        st.session_state.batch_archive = build_archive(results).getvalue()
+    
+    if st.session_state.get("batch_archive"):
+        st.download_button(
+            label=" Download Transcriptions",
+            data=st.session_state.batch_archive,
+            file_name="transcriptions.zip",
+            mime="application/zip"
+        )
 
 def main():
     # Apply custom CSS
     local_css()
     
+    if METRICS_PORT:
+        start_metrics_endpoint(METRICS_PORT)
+    
     # Initialize session state to track which mode is active
     if 'active_mode' not in st.session_state:
         st.session_state.active_mode = None
@@ -459,10 +746,16 @@ def main():
             </div>
             """, unsafe_allow_html=True)
             
-            uploaded_file = st.file_uploader(
-                "Drag and drop or choose an audio file", 
-                type=SUPPORTED_FORMATS
-            )
+            batch_mode = st.toggle("Batch mode", key="batch_mode", help="Transcribe many files or a zip at once")
+            
+            if batch_mode:
+                render_batch_mode()
+                uploaded_file = None
+            else:
+                uploaded_file = st.file_uploader(
+                    "Drag and drop or choose an audio file", 
+                    type=SUPPORTED_FORMATS
+                )
             
             if uploaded_file:
                 # Show file info in a custom format similar to the images
@@ -495,22 +788,16 @@ def main():
                 valid, message = validate_file(uploaded_file)
                 if not valid:
                     st.error(message)
+                elif PREFETCH != "off":
+                    # Get a head start while the user looks the file over
+                    start_prefetch(uploaded_file)
                 
                 # Transcribe Button
                 if st.button("🎧 Transcribe Now", key="upload_transcribe", use_container_width=True, type="primary"):
-                    # Convert to WAV
-                    with st.spinner("Converting audio..."):
-                        processed_file = convert_to_wav(uploaded_file)
-                    
-                    if processed_file:
-                        # Attempt Transcription
-                        with st.spinner("Transcribing your audio..."):
-                            success, result = transcribe_audio(processed_file)
-                        
-                        if success:
-                            transcription_result = result
-                        else:
-                            st.error(result)
+                    # Convert, split and transcribe in the background
+                    start_transcription_job(uploaded_file)
+            else:
+                cancel_prefetch()
 
     # Record Audio Section
     elif st.session_state.active_mode == "record":
@@ -526,32 +813,51 @@ def main():
             </div>
             """, unsafe_allow_html=True)
             
-            audio_data = st.audio_input("Record your audio")
+            live_mode = st.toggle("Live transcription", key="live_mode", help="See the text while you speak")
             
-            if audio_data:
-                st.markdown("""
-                <div style="background-color: #e8f5e9; border-radius: 8px; padding: 12px; margin: 15px 0; border-left: 4px solid #4caf50;">
-                    <div style="display: flex; align-items: center;">
-                        <div style="background-color: #4caf50; width: 30px; height: 30px; border-radius: 50%; display: flex; align-items: center; justify-content: center; margin-right: 12px;">
-                            <span style="color: white; font-size: 16px;">✓</span>
-                        </div>
-                        <div style="font-weight: 500; color: #2e7d32;">Audio recorded successfully!</div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+            if live_mode and webrtc_streamer is not None:
+                transcription_result = run_live_transcription()
+            else:
+                if live_mode:
+                    st.caption("Install streamlit-webrtc to stream from the microphone. "
+                               "Until then recordings are transcribed window by window once you stop.")
                 
-                # Removed audio preview display
+                audio_data = st.audio_input("Record your audio")
                 
-                if st.button("Transcribe Recorded Audio", key="record_transcribe", use_container_width=True):
-                    # Attempt Transcription
-                    with st.spinner("Processing your audio..."):
-                        success, result = transcribe_audio(audio_data)
-                        
-                        if success:
-                            transcription_result = result
+                if audio_data:
+                    st.markdown("""
+                    <div style="background-color: #e8f5e9; border-radius: 8px; padding: 12px; margin: 15px 0; border-left: 4px solid #4caf50;">
+                        <div style="display: flex; align-items: center;">
+                            <div style="background-color: #4caf50; width: 30px; height: 30px; border-radius: 50%; display: flex; align-items: center; justify-content: center; margin-right: 12px;">
+                                <span style="color: white; font-size: 16px;">✓</span>
+                            </div>
+                            <div style="font-weight: 500; color: #2e7d32;">Audio recorded successfully!</div>
+                        </div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    
+                    # Removed audio preview display
+                    
+                    if st.button("Transcribe Recorded Audio", key="record_transcribe", use_container_width=True):
+                        if live_mode:
+                            # Show the text window by window as it arrives
+                            success, result = transcribe_progressively(audio_data, st.empty())
+                            
+                            if success:
+                                transcription_result = result
+                            else:
+                                st.error(result)
                         else:
-                            st.error(result)
-
+                            # Attempt Transcription in the background
+                            start_transcription_job(audio_data)
+    
+    # Background jobs finish independently of reruns
+    res_col1, res_col2, res_col3 = st.columns([1, 2, 1])
+    with res_col2:
+        collect_job_result()
+    if transcription_result is None:
+        transcription_result = st.session_state.get("transcription_result")
+    
     # Display Transcription Result
     if transcription_result:
         # Create columns to control width for the transcription result
@@ -586,16 +892,27 @@ def main():
             
             with col2:
                 # Download Button
-                txt_filename = "transcription.txt"
-                txt_bytes = BytesIO(transcription_result.encode("utf-8"))
+                exports = {"TXT": (transcription_result, "transcription.txt", "text/plain")}
+                transcript = st.session_state.get("transcript")
+                if transcript is not None and transcript.text == transcription_result:
+                    exports["SRT"] = (transcript.to_srt(), "transcription.srt", "application/x-subrip")
+                    exports["VTT"] = (transcript.to_vtt(), "transcription.vtt", "text/vtt")
+                    exports["JSON"] = (transcript.to_json(), "transcription.json", "application/json")
+                export_format = st.selectbox("Format", list(exports), label_visibility="collapsed")
+                export_text, export_filename, export_mime = exports[export_format]
                 st.download_button(
                     label=" Download Transcription",
-                    data=txt_bytes,
-                    file_name=txt_filename,
-                    mime="text/plain"
+                    data=BytesIO(export_text.encode("utf-8")),
+                    file_name=export_filename,
+                    mime=export_mime
                 )
             
             st.markdown("</div>", unsafe_allow_html=True)
+    
+    render_search_panel()
+    
+    if DEBUG_PANEL:
+        render_debug_panel()
 
 if __name__ == "__main__":
     main()
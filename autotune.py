@@ -0,0 +1,376 @@
+"""
+Adaptive chunk length and request concurrency for the transcription API.
+
+The AdaptiveTuner watches finished API requests, splitting each one into
+upload time and server time, and adjusts two knobs the AIMD way: additive
+steps up while requests are healthy and there is evidence more would
+help, multiplicative cuts on failures, timeouts and queueing, and a step
+back when another request in flight didn't raise upload throughput. Every change
+is written to a JSON-lines decision log along with the estimates behind it.
+"""
+import collections
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Range and additive step of the chunk length, in seconds of audio
+MIN_SEGMENT_SECONDS = 60.0
+MAX_SEGMENT_SECONDS = 30 * 60.0
+SEGMENT_STEP_SECONDS = 60.0
+# Recordings are spread over more chunks, to keep every slot busy, only
+# while each chunk still gets this much audio and it saves this much time,
+# which pays for splitting and the words lost at extra cuts
+MIN_SPREAD_SECONDS = 5 * 60.0
+MIN_SPREAD_SAVING_SECONDS = 10.0
+SPLIT_SLACK = 1.1
+# Range of requests in flight across the whole process
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+# Multiplicative cuts after a failed request and after queueing at the API
+FAILURE_BACKOFF = 0.5
+LATENCY_BACKOFF = 0.75
+# Server time per audio second this far above the best recently seen means
+# requests are queueing at the API
+CONGESTION_RATIO = 1.5
+# How fast the best-seen server time is forgotten, per request
+BASELINE_DRIFT = 0.002
+# A step up in concurrency is kept only if total upload throughput rose by
+# at least this share of the step, otherwise the uplink is the limit and
+# concurrency is held below it for a number of rounds before trying again
+UPLOAD_GAIN_SHARE = 0.5
+UPLOAD_PROBE_ROUNDS = 20
+# A chunk's predicted server time is kept under this share of the read timeout
+TIMEOUT_SHARE = 0.5
+# Chunks grow while fixed per-request overhead is more than this share of one
+OVERHEAD_SHARE = 0.1
+# Requests the estimates are fitted over, and seen between chunk length changes
+WINDOW = 32
+SEGMENT_HOLD = 4
+# The decision log is rotated to ``<path>.1`` past this size
+LOG_MAX_BYTES = 4 * 1024 * 1024
+
+
+class AdaptiveTuner:
+    """
+    AIMD controller for chunk length and requests in flight.
+
+    Server time is modelled as a fixed per-request overhead plus a cost per
+    second of audio, fitted over recent requests. Concurrency grows by one
+    after a round of healthy requests that used every slot, and is cut when
+    a request fails or server time per audio second rises well above the
+    best seen, the sign of requests queueing. A step up that leaves total
+    upload throughput flat is taken back, since the extra request only
+    shares the same uplink. Chunks grow by a step while
+    overhead is a large share of each request and the predicted server time
+    stays well inside the read timeout, and are halved on a timeout or when
+    the prediction gets too close to it.
+
+    Args:
+        segment_seconds (float): Starting chunk length
+        concurrency (int): Starting requests in flight
+        read_timeout (float): Client read timeout, in seconds
+        log_path (str): Decision log file, None for no file
+        adaptive (bool): Adjust the knobs, or just report fixed ones
+        smoothing (float): Weight of the newest request in the running cost
+    """
+
+    def __init__(self, segment_seconds=20 * 60.0, concurrency=4, read_timeout=60.0, log_path=None,
+                 adaptive=True, smoothing=0.3):
+        self.segment_seconds = float(segment_seconds)
+        self.concurrency = int(concurrency)
+        self.read_timeout = read_timeout
+        self.log_path = log_path
+        self.adaptive = adaptive
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.cost = None
+        self.base_cost = None
+        self.decisions = collections.deque(maxlen=100)
+        # (audio seconds, bytes sent, upload seconds, server seconds) per request
+        self._window = collections.deque(maxlen=WINDOW)
+        self._since_concurrency = 0
+        self._since_segment = 0
+        self._saturated = False
+        # Chunk-sized bytes and upload seconds at the current concurrency
+        self._round_bytes = 0
+        self._round_upload = 0.0
+        # (concurrency, upload throughput) before the last step up
+        self._probe = None
+        self.upload_limit = None
+        self._held_rounds = 0
+        self._condition = threading.Condition()
+
+    def max_workers(self):
+        """Threads worth starting for one file's chunks."""
+        return MAX_CONCURRENCY if self.adaptive else self.concurrency
+
+    def segment_for(self, total_seconds):
+        """
+        Chunk length for a recording: even chunks no longer than the tuned
+        length. Recordings are spread over more chunks, one per slot, when
+        each still gets MIN_SPREAD_SECONDS of audio and the fitted server
+        time says that saves at least MIN_SPREAD_SAVING_SECONDS.
+
+        Args:
+            total_seconds (float): Length of the recording, 0 if unknown
+
+        Returns:
+            float: Seconds of audio per chunk
+        """
+        if not self.adaptive or not total_seconds:
+            return self.segment_seconds
+        with self._condition:
+            count = math.ceil(total_seconds / self.segment_seconds)
+            spread = min(self.concurrency, int(total_seconds // MIN_SPREAD_SECONDS))
+            per_second = self._estimates()["server_seconds_per_audio_second"]
+            if spread > count and per_second is not None:
+                # Chunks run side by side, so latency follows the audio per chunk
+                if per_second * total_seconds * (1 / count - 1 / spread) >= MIN_SPREAD_SAVING_SECONDS:
+                    count = spread
+            if count <= 1:
+                return total_seconds
+            # Cuts land on pauses before the limit, leave room so the last chunk isn't a sliver
+            return min(total_seconds / count * SPLIT_SLACK, self.segment_seconds)
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the ``concurrency`` request slots, waiting for one if needed."""
+        if not self.adaptive:
+            yield
+            return
+        with self._condition:
+            while self.in_flight >= self.concurrency:
+                self._saturated = True
+                self._condition.wait()
+            self.in_flight += 1
+            if self.in_flight >= self.concurrency:
+                self._saturated = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def estimates(self):
+        """
+        Current model of the API, fitted over the recent window.
+
+        Returns:
+            dict: Upload rate in bytes per second, server overhead in seconds
+                and server seconds per audio second, each None until measured
+        """
+        with self._condition:
+            return self._estimates()
+
+    def _estimates(self):
+        sent = [(size, upload) for _, size, upload, _ in self._window if size and upload]
+        upload_rate = sum(size for size, _ in sent) / sum(upload for _, upload in sent) if sent else None
+        overhead, per_second, _ = self._fit()
+        return {"upload_bytes_per_second": upload_rate, "server_overhead_seconds": overhead,
+                "server_seconds_per_audio_second": per_second}
+
+    def _fit(self, min_audio=0.0):
+        """
+        Least-squares fit of server time against audio length over the window.
+
+        Args:
+            min_audio (float): Only fit requests with at least this much audio
+
+        Returns:
+            tuple: Overhead in seconds and server seconds per audio second,
+                both None without requests, and whether the two could be
+                separated. When they couldn't, all of the time is counted
+                as per-second cost, an upper bound.
+        """
+        points = [(audio, server) for audio, _, _, server in self._window if audio >= min_audio]
+        if not points:
+            return None, None, False
+        count = len(points)
+        mean_audio = sum(audio for audio, _ in points) / count
+        mean_server = sum(server for _, server in points) / count
+        spread = sum((audio - mean_audio) ** 2 for audio, _ in points)
+        if count >= 3 and spread > 1e-6 * count * mean_audio ** 2:
+            slope = sum((audio - mean_audio) * (server - mean_server) for audio, server in points) / spread
+            if slope > 0:
+                return max(mean_server - slope * mean_audio, 0.0), slope, True
+        # Chunks all the same length can't separate the two
+        return 0.0, mean_server / mean_audio, False
+
+    def observe(self, audio_seconds, bytes_sent=None, upload_seconds=None, server_seconds=None):
+        """
+        Feed a successful request into the estimates and adjust the knobs.
+
+        Args:
+            audio_seconds (float): Length of the audio sent
+            bytes_sent (int): Size of the upload, None if unknown
+            upload_seconds (float): Time spent sending the body, None if unknown
+            server_seconds (float): Time from the end of the upload to the response
+        """
+        if server_seconds is None:
+            return
+        with self._condition:
+            # Requests of unknown length can't be fitted, but still count towards a round
+            if audio_seconds and audio_seconds > 0:
+                self._window.append((audio_seconds, bytes_sent, upload_seconds, max(server_seconds, 0.0)))
+            self._since_concurrency += 1
+            self._since_segment += 1
+            # Short clips are mostly overhead, so only chunk-sized ones measure
+            # queueing or decide the chunk length
+            overhead, per_second, fitted = self._fit(MIN_SEGMENT_SECONDS / 2)
+            if bytes_sent and upload_seconds and audio_seconds >= MIN_SEGMENT_SECONDS / 2:
+                self._round_bytes += bytes_sent
+                self._round_upload += upload_seconds
+            if per_second is not None and audio_seconds >= MIN_SEGMENT_SECONDS / 2:
+                cost = max(server_seconds - overhead, 0.0) / audio_seconds
+                self.cost = cost if self.cost is None else self.cost + self.smoothing * (cost - self.cost)
+                self.base_cost = self.cost if self.base_cost is None else min(
+                    self.base_cost * (1 + BASELINE_DRIFT), self.cost
+                )
+            if not self.adaptive:
+                return
+
+            if self._since_concurrency >= self.concurrency:
+                if self.cost is not None and self.cost > CONGESTION_RATIO * self.base_cost:
+                    self._set(concurrency=self.concurrency * LATENCY_BACKOFF, reason="queueing")
+                    # Measure the next round against this one, so a baseline
+                    # that was only noise can't cut concurrency again and again
+                    self.base_cost = self.cost
+                elif self._saturated:
+                    self._step_up()
+
+            # At most once a round, like concurrency, and only once overhead
+            # and per-second cost are told apart, an upper bound would only shrink chunks
+            if fitted and self._since_segment >= max(SEGMENT_HOLD, self.concurrency):
+                budget = TIMEOUT_SHARE * self.read_timeout
+                if overhead + per_second * self.segment_seconds > budget:
+                    self._set(segment_seconds=self.segment_seconds * FAILURE_BACKOFF, reason="near timeout")
+                elif (overhead > OVERHEAD_SHARE * (overhead + per_second * self.segment_seconds)
+                      and overhead + per_second * (self.segment_seconds + SEGMENT_STEP_SECONDS) <= budget):
+                    self._set(segment_seconds=self.segment_seconds + SEGMENT_STEP_SECONDS, reason="overhead")
+
+    def _upload_throughput(self):
+        # Every slot was busy, so as many uploads as slots ran side by side
+        if not self._round_upload:
+            return None
+        return self._round_bytes / self._round_upload * self.concurrency
+
+    def _step_up(self):
+        # Called with the lock held after a saturated, healthy round
+        throughput = self._upload_throughput()
+        probe = self._probe
+        if probe is not None and probe[1] and throughput is not None:
+            expected = probe[1] * (1 + UPLOAD_GAIN_SHARE * (self.concurrency - probe[0]) / probe[0])
+            if throughput < expected:
+                self.upload_limit = probe[0]
+                self._held_rounds = 0
+                self._set(concurrency=probe[0], reason="upload bound")
+                return
+        if self.upload_limit is not None and self.concurrency >= self.upload_limit:
+            # Hold for a while, the uplink may have room again later
+            self._since_concurrency = 0
+            self._saturated = False
+            self._held_rounds += 1
+            if self._held_rounds >= UPLOAD_PROBE_ROUNDS:
+                self.upload_limit = None
+            return
+        previous = self.concurrency
+        self._set(concurrency=previous + 1, reason="healthy")
+        if self.concurrency > previous:
+            self._probe = (previous, throughput)
+
+    def observe_failure(self, timed_out=False):
+        """
+        Back off after a request the API rejected as overloaded or never answered.
+
+        Args:
+            timed_out (bool): The request hit the read timeout, so chunks shrink too
+        """
+        if not self.adaptive:
+            return
+        with self._condition:
+            if timed_out:
+                self._set(concurrency=self.concurrency * FAILURE_BACKOFF,
+                          segment_seconds=self.segment_seconds * FAILURE_BACKOFF, reason="timeout")
+            else:
+                self._set(concurrency=self.concurrency * FAILURE_BACKOFF, reason="failure")
+
+    def _set(self, reason, concurrency=None, segment_seconds=None):
+        # Called with the lock held
+        previous = (self.concurrency, self.segment_seconds)
+        upload_throughput = self._upload_throughput()
+        if concurrency is not None:
+            self.concurrency = min(max(int(concurrency), MIN_CONCURRENCY), MAX_CONCURRENCY)
+            self._since_concurrency = 0
+            self._saturated = False
+            self._round_bytes = 0
+            self._round_upload = 0.0
+            self._probe = None
+            self._condition.notify_all()
+        if segment_seconds is not None:
+            self.segment_seconds = min(max(segment_seconds, MIN_SEGMENT_SECONDS), MAX_SEGMENT_SECONDS)
+            self._since_segment = 0
+        if (self.concurrency, self.segment_seconds) == previous:
+            return
+        decision = {
+            "time": time.time(),
+            "reason": reason,
+            "concurrency": self.concurrency,
+            "segment_seconds": self.segment_seconds,
+            "previous_concurrency": previous[0],
+            "previous_segment_seconds": previous[1],
+            "in_flight": self.in_flight,
+            "cost": self.cost,
+            "base_cost": self.base_cost,
+            "upload_throughput": upload_throughput,
+            **self._estimates()
+        }
+        self.decisions.append(decision)
+        logger.info("Tuning %s: concurrency %d -> %d, chunks %.0fs -> %.0fs", reason, previous[0],
+                    self.concurrency, previous[1], self.segment_seconds)
+        if self.log_path:
+            self._write(decision)
+
+    def _write(self, decision):
+        try:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > LOG_MAX_BYTES:
+                os.replace(self.log_path, self.log_path + ".1")
+            with open(self.log_path, "a", encoding="utf-8") as log:
+                log.write(json.dumps(decision) + "\n")
+        except OSError:
+            logger.exception("Couldn't write the tuning decision log")
+
+    def recent_decisions(self):
+        """The last hundred decisions, oldest first."""
+        with self._condition:
+            return list(self.decisions)
+
+    def stats(self):
+        """
+        Snapshot of the knobs and estimates.
+
+        Returns:
+            dict: Name to value
+        """
+        with self._condition:
+            return {
+                "adaptive": self.adaptive,
+                "concurrency": self.concurrency,
+                "segment_seconds": self.segment_seconds,
+                "in_flight": self.in_flight,
+                "cost": self.cost,
+                "base_cost": self.base_cost,
+                "upload_throughput": self._upload_throughput(),
+                "upload_limit": self.upload_limit,
+                "decisions": len(self.decisions),
+                **self._estimates()
+            }
@@ -0,0 +1,179 @@
+"""
+Transcription backends and the policy for falling back between them.
+
+A backend is any object with an ``identity`` string, which keys its cached
+results, and a ``transcribe(audio_file, session=None, timestamps=False)``
+method returning ``(success, text or Transcript, or error message)``.
+Backends are registered by name with transcriber.register_backend().
+"""
+import importlib.util
+import logging
+import threading
+import time
+
+from ffmpeg_stream import disk_path
+from metrics import trace
+from transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+# Local quality settings: faster-whisper model size and beam width
+LOCAL_PRESETS = {
+    "fast": ("base", 1),
+    "balanced": ("small", 3),
+    "accurate": ("medium", 5),
+}
+
+
+class LocalWhisperBackend:
+    """
+    Whisper on this machine's CPU through faster-whisper (CTranslate2, int8).
+
+    The model is loaded on first use, or by warm(), and then stays loaded
+    for every session in the process. Calls run one at a time, each using
+    all the CPU threads it is given.
+
+    Args:
+        model_size (str): faster-whisper model name or path
+        beam_size (int): Beam width, 1 for greedy decoding
+        compute_type (str): CTranslate2 quantization
+        cpu_threads (int): Threads per call, 0 for one per core
+        download_root (str): Where models are downloaded and cached
+    """
+
+    def __init__(self, model_size="small", beam_size=3, compute_type="int8", cpu_threads=0, download_root=None):
+        self.model_size = model_size
+        self.beam_size = beam_size
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.download_root = download_root
+        self.identity = f"local:{model_size}:{compute_type}:beam{beam_size}"
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._run_lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        return importlib.util.find_spec("faster_whisper") is not None
+
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from faster_whisper import WhisperModel
+
+                    started = time.monotonic()
+                    self._model = WhisperModel(
+                        self.model_size, device="cpu", compute_type=self.compute_type,
+                        cpu_threads=self.cpu_threads, download_root=self.download_root
+                    )
+                    logger.info("Loaded local Whisper model %s in %.1fs", self.model_size,
+                                time.monotonic() - started)
+        return self._model
+
+    def warm(self):
+        """Load the model on a background thread, so the first fallback doesn't wait for it."""
+        if self._model is None:
+            threading.Thread(target=self.model, daemon=True, name="audioink-model-load").start()
+
+    def transcribe(self, audio_file, session=None, timestamps=False):
+        """
+        Transcribe audio locally. ``session`` is accepted for the interface
+        and ignored, local runs don't spend API quota.
+        """
+        model = self.model()
+        audio_file.seek(0)
+        with self._run_lock, trace("local_transcribe") as span:
+            segments, info = model.transcribe(
+                disk_path(audio_file) or audio_file, beam_size=self.beam_size, word_timestamps=timestamps
+            )
+            # Decoding happens as the generator is consumed
+            segments = list(segments)
+            span.audio_seconds = info.duration
+        audio_file.seek(0)
+
+        # Same shape as a verbose_json API response
+        data = {
+            "text": "".join(segment.text for segment in segments),
+            "duration": info.duration,
+            "segments": [{"start": s.start, "end": s.end, "text": s.text} for s in segments],
+            "words": [
+                {"start": word.start, "end": word.end, "word": word.word}
+                for segment in segments for word in (segment.words or [])
+            ]
+        }
+        return True, Transcript.from_response(data) if timestamps else data["text"].strip()
+
+
+class FallbackPolicy:
+    """
+    Circuit breaker deciding when to stop waiting on the primary backend.
+
+    Failed requests and slow ones both count against the primary. Once its
+    running bad-request rate passes the threshold, requests go straight to
+    the fallback for a cooldown that doubles each time the primary trips
+    again, after which the primary is tried again.
+
+    Args:
+        slow_seconds (float): Fixed allowance for a request before it is slow
+        slow_realtime (float): Extra allowance per second of audio
+        max_bad_rate (float): Bad-request rate that trips the breaker
+        min_requests (int): Requests seen before the rate alone trips it
+        smoothing (float): Weight of the newest request in the running rate
+        cooldown (float): First time spent on the fallback, in seconds
+        max_cooldown (float): Longest time spent on the fallback, in seconds
+    """
+
+    def __init__(self, slow_seconds=10.0, slow_realtime=0.5, max_bad_rate=0.5, min_requests=3,
+                 smoothing=0.3, cooldown=60.0, max_cooldown=600.0):
+        self.slow_seconds = slow_seconds
+        self.slow_realtime = slow_realtime
+        self.max_bad_rate = max_bad_rate
+        self.min_requests = min_requests
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.bad_rate = 0.0
+        self.requests = 0
+        self.trips = 0
+        self.fallbacks = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow_primary(self):
+        return time.monotonic() >= self.open_until
+
+    def record(self, success, elapsed, audio_seconds):
+        """
+        Feed one primary request into the running estimate.
+
+        Returns:
+            bool: Whether the request counted as bad
+        """
+        bad = not success or elapsed > self.slow_seconds + self.slow_realtime * audio_seconds
+        with self._lock:
+            self.requests += 1
+            self.bad_rate += self.smoothing * ((1.0 if bad else 0.0) - self.bad_rate)
+            if not bad:
+                self.trips = 0
+            elif self.requests >= self.min_requests and self.bad_rate >= self.max_bad_rate:
+                cooldown = min(self.cooldown * 2 ** self.trips, self.max_cooldown)
+                self.open_until = time.monotonic() + cooldown
+                self.trips += 1
+                # Start from a clean slate when the primary gets its next chance
+                self.requests = 0
+                self.bad_rate = 0.0
+                logger.warning("Primary transcription backend unhealthy, using the fallback for %.0fs", cooldown)
+        return bad
+
+    def note_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self):
+        return {
+            "bad_rate": self.bad_rate,
+            "on_fallback": not self.allow_primary(),
+            "trips": self.trips,
+            "fallbacks": self.fallbacks
+        }
@@ -0,0 +1,192 @@
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
+from io import BytesIO
+
+from ffmpeg_stream import demuxer_name
+
+
+def expand_uploads(uploaded_files, supported_formats, max_size=None, max_total_size=None):
+    """
+    Flatten uploaded files and zip archives into individual audio items.
+
+    Zip members are checked against the limits by their recorded size
+    before anything is decompressed, so a small archive can't expand into
+    more memory than the limits allow.
+
+    Args:
+        uploaded_files (list): File-like uploads with a ``name`` attribute
+        supported_formats (list): Audio extensions to keep from zip archives
+        max_size (int): Largest item in bytes, None for no limit
+        max_total_size (int): Most bytes read over all items, None for no limit
+
+    Returns:
+        list: (name, bytes) pairs in upload order, with None instead of the
+            bytes for items skipped for being over a limit
+    """
+    items = []
+    total = 0
+
+    def fits(size):
+        return (max_size is None or size <= max_size) and (max_total_size is None or total + size <= max_total_size)
+
+    for uploaded_file in uploaded_files:
+        uploaded_file.seek(0)
+        if uploaded_file.name.lower().endswith(".zip"):
+            with zipfile.ZipFile(uploaded_file) as archive:
+                for member in archive.infolist():
+                    name = member.filename
+                    if member.is_dir() or name.startswith("__MACOSX/"):
+                        continue
+                    if name.split(".")[-1].lower() not in supported_formats:
+                        continue
+                    if not fits(member.file_size):
+                        items.append((name, None))
+                        continue
+                    # Reads stop at the recorded size, whatever the compressed data says
+                    data = archive.read(member)
+                    total += len(data)
+                    items.append((name, data))
+        else:
+            data = uploaded_file.read()
+            if fits(len(data)):
+                total += len(data)
+                items.append((uploaded_file.name, data))
+            else:
+                items.append((uploaded_file.name, None))
+        uploaded_file.seek(0)
+    return items
+
+
+def convert_item(name, data, output_format, sample_rate, bitrate):
+    """
+    Re-encode one audio item for upload. Runs in a worker process.
+
+    Args:
+        name (str): File name, used for the input format
+        data (bytes): The audio bytes
+        output_format (str): Upload format
+        sample_rate (int): Upload sample rate in Hz
+        bitrate (str): Upload bitrate
+
+    Returns:
+        tuple: (upload file name, encoded bytes)
+    """
+    # Imported here so the worker processes only pay for pydub
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(BytesIO(data), format=demuxer_name(name.split(".")[-1].lower()))
+    output = BytesIO()
+    audio.set_frame_rate(sample_rate).set_channels(1).export(output, format=output_format, bitrate=bitrate)
+    base_name = os.path.splitext(os.path.basename(name))[0]
+    return f"{base_name}.{output_format}", output.getvalue()
+
+
+def _transcribe_item(transcribe, name, upload_name, data):
+    upload_file = BytesIO(data)
+    upload_file.name = upload_name
+    return transcribe(upload_file, name)
+
+
+def run_batch(items, transcribe, output_format="mp3", sample_rate=16000, bitrate="32k",
+              convert_workers=2, api_workers=4, on_progress=None):
+    """
+    Convert items on a process pool and transcribe them on a thread pool.
+
+    Each item is handed to the API pool as soon as its conversion finishes,
+    so uploads overlap with the remaining conversions.
+
+    Args:
+        items (list): (name, bytes) pairs as returned by expand_uploads
+        transcribe: Callable taking a file-like upload and the item's
+            original name, returning ``(success, text or error message)``
+        output_format (str): Upload format
+        sample_rate (int): Upload sample rate in Hz
+        bitrate (str): Upload bitrate
+        convert_workers (int): Conversion processes
+        api_workers (int): Requests in flight at the same time
+        on_progress: Optional callable ``(index, status)`` called from the
+            calling thread whenever an item changes state
+
+    Returns:
+        list: (name, success, text or error message) in input order
+    """
+    results = [None] * len(items)
+
+    def report(index, status):
+        if on_progress:
+            on_progress(index, status)
+
+    convert = partial(convert_item, output_format=output_format, sample_rate=sample_rate, bitrate=bitrate)
+    # Spawned workers don't inherit the server's threads or sockets
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=convert_workers, mp_context=context) as converters, \
+            ThreadPoolExecutor(max_workers=api_workers) as uploaders:
+        conversions = {}
+        for index, (name, data) in enumerate(items):
+            conversions[converters.submit(convert, name, data)] = index
+            report(index, "converting")
+
+        uploads = {}
+        pending = set(conversions)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in conversions:
+                    index = conversions[future]
+                    try:
+                        upload_name, upload_data = future.result()
+                    except Exception as e:
+                        results[index] = (items[index][0], False, f"Error converting audio: {str(e)}")
+                        report(index, "failed")
+                        continue
+                    upload = uploaders.submit(
+                        _transcribe_item, transcribe, items[index][0], upload_name, upload_data
+                    )
+                    uploads[upload] = index
+                    pending.add(upload)
+                    report(index, "transcribing")
+                else:
+                    index = uploads[future]
+                    try:
+                        success, text = future.result()
+                    except Exception as e:
+                        success, text = False, f"Transcription error: {str(e)}"
+                    results[index] = (items[index][0], success, text)
+                    report(index, "done" if success else "failed")
+
+    return results
+
+
+def build_archive(results):
+    """
+    Bundle batch transcripts into a zip archive.
+
+    Args:
+        results (list): (name, success, text or error message) tuples
+
+    Returns:
+        BytesIO: The zip archive, one .txt per transcript plus errors.txt
+    """
+    archive_io = BytesIO()
+    errors = []
+    used_names = set()
+    with zipfile.ZipFile(archive_io, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, success, text in results:
+            if not success:
+                errors.append(f"{name}: {text}")
+                continue
+            base_name = os.path.splitext(name)[0]
+            txt_name = f"{base_name}.txt"
+            suffix = 1
+            while txt_name in used_names:
+                suffix += 1
+                txt_name = f"{base_name}_{suffix}.txt"
+            used_names.add(txt_name)
+            archive.writestr(txt_name, text)
+        if errors:
+            archive.writestr("errors.txt", "\n".join(errors))
+    archive_io.seek(0)
+    return archive_io
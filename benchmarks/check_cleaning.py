@@ -0,0 +1,55 @@
+"""
+Check clean_transcription against a corpus of outputs recorded earlier.
+
+Each line of the corpus holds an ``input`` and the ``expected`` output of
+the original, unoptimized clean_transcription, so any change to what the
+cleaning produces fails the check, however small.
+
+    python benchmarks/check_cleaning.py
+    python benchmarks/check_cleaning.py --corpus other.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcriber import clean_transcription  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "clean_transcription.jsonl")
+
+
+def check(path=CORPUS_PATH):
+    """
+    Clean every corpus input and compare it with the recorded output.
+
+    Returns:
+        tuple: (cases checked, list of (line number, input, expected, actual) mismatches)
+    """
+    mismatches = []
+    count = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            case = json.loads(line)
+            actual = clean_transcription(case["input"])
+            count += 1
+            if actual != case["expected"]:
+                mismatches.append((number, case["input"], case["expected"], actual))
+    return count, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check clean_transcription against recorded outputs.")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="JSON-lines file of input/expected pairs")
+    args = parser.parse_args(argv)
+
+    count, mismatches = check(args.corpus)
+    for number, text, expected, actual in mismatches[:10]:
+        print(f"line {number}: {text!r}\n  expected {expected!r}\n  got      {actual!r}")
+    print(f"{count - len(mismatches)}/{count} outputs match")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
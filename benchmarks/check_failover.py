@@ -0,0 +1,108 @@
+"""
+Check the endpoint pool's ejection and recovery against mock endpoints.
+
+Three mock Whisper servers stand in for deployments: one healthy, one too
+slow to answer inside the read timeout and one answering 503. Traffic must
+keep succeeding while the bad two are ejected, and once they are fixed and
+their cooldown has passed they must be taking requests again.
+
+    python benchmarks/check_failover.py
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_balancer import EndpointPool  # noqa: E402
+from mock_whisper import MockWhisperServer  # noqa: E402
+from whisper_client import WhisperClient  # noqa: E402
+
+
+def send_round(pool, requests, workers, audio_seconds):
+    """
+    Send requests through the pool from several threads.
+
+    Returns:
+        int: Requests that got a 200 response
+    """
+    def send(index):
+        audio_file = BytesIO(b"\0" * 32000)
+        audio_file.name = f"chunk_{index:03d}.wav"
+        try:
+            response = pool.post_audio(audio_file, audio_seconds=audio_seconds)
+        except Exception:
+            return False
+        return response.status_code == 200
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(send, range(requests)))
+
+
+def check(requests=40, workers=8, read_timeout=0.5, eject_seconds=1.0):
+    """
+    Run the scenario and list what went wrong.
+
+    Returns:
+        list: Failed checks, empty when the pool behaved
+    """
+    healthy = MockWhisperServer(latency=0.02).start()
+    slow = MockWhisperServer(latency=read_timeout * 3).start()
+    failing = MockWhisperServer(latency=0.02, status=503).start()
+    servers = {"healthy": healthy, "slow": slow, "failing": failing}
+    try:
+        pool = EndpointPool(
+            [(WhisperClient(server.url, "key", max_retries=0, read_timeout=read_timeout), 1.0)
+             for server in servers.values()],
+            eject_seconds=eject_seconds, max_eject_seconds=eject_seconds
+        )
+        endpoints = dict(zip(servers, pool.endpoints))
+        problems = []
+
+        succeeded = send_round(pool, requests, workers, 1.0)
+        print(f"degraded: {succeeded}/{requests} succeeded")
+        if succeeded < requests:
+            problems.append(f"{requests - succeeded} requests failed while the healthy endpoint was up")
+        for name in ("slow", "failing"):
+            ejections = endpoints[name].ejections
+            print(f"  {name}: ejected {ejections} time(s)")
+            if not ejections:
+                problems.append(f"{name} endpoint was never ejected")
+
+        slow.latency = 0.02
+        failing.status = 200
+        time.sleep(eject_seconds)
+        seen = {name: server.requests for name, server in servers.items()}
+        succeeded = send_round(pool, requests, workers, 1.0)
+        print(f"recovered: {succeeded}/{requests} succeeded")
+        if succeeded < requests:
+            problems.append(f"{requests - succeeded} requests failed after every endpoint recovered")
+        for name in ("slow", "failing"):
+            served = servers[name].requests - seen[name]
+            print(f"  {name}: served {served}, error rate {endpoints[name].error_rate:.2f}")
+            if not served:
+                problems.append(f"{name} endpoint got no traffic after recovering")
+        return problems
+    finally:
+        for server in servers.values():
+            server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check endpoint ejection and recovery against mock servers.")
+    parser.add_argument("--requests", type=int, default=40, help="requests per phase")
+    parser.add_argument("--workers", type=int, default=8, help="requests in flight")
+    args = parser.parse_args(argv)
+
+    problems = check(args.requests, args.workers)
+    if problems:
+        print(f"\n{len(problems)} problem(s): {'; '.join(problems)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Local stand-in for the Whisper transcription endpoint.
+
+Reads the whole upload, waits the configured latency and answers with a
+fixed transcript, or with an error status, so benchmarks measure the
+client side only.
+
+    python benchmarks/mock_whisper.py --port 8765 --latency 0.5
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPONSE_TEXT = "so um this is a test recording. i think its working [music] ♪ thanks for listening"
+
+
+def _read_body(handler):
+    if handler.headers.get("Transfer-Encoding", "").lower() == "chunked":
+        body = bytearray()
+        while True:
+            size = int(handler.rfile.readline().split(b";")[0].strip(), 16)
+            if size == 0:
+                handler.rfile.readline()
+                break
+            body += handler.rfile.read(size)
+            handler.rfile.readline()
+        return bytes(body)
+    return handler.rfile.read(int(handler.headers.get("Content-Length", 0)))
+
+
+class MockWhisperServer:
+    """
+    Threaded HTTP server answering every POST like the transcription API.
+
+    Args:
+        latency (float): Seconds to wait before answering
+        jitter (float): Extra random wait of up to this many seconds
+        port (int): Port to listen on, 0 for any free port
+        status (int): HTTP status to answer with, 200 for a transcript
+
+    Latency and status can be changed while the server runs.
+    """
+
+    def __init__(self, latency=0.2, jitter=0.0, port=0, status=200):
+        self.latency = latency
+        self.jitter = jitter
+        self.status = status
+        self.requests = 0
+        self.bytes_received = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = _read_body(self)
+                server.requests += 1
+                server.bytes_received += len(body)
+                time.sleep(server.latency + random.uniform(0, server.jitter))
+
+                status = server.status
+                payload = {"text": RESPONSE_TEXT} if status == 200 else {"error": "mock failure"}
+                if status == 200 and b"verbose_json" in body:
+                    payload["duration"] = 1.0
+                    payload["segments"] = [{"start": 0.0, "end": 1.0, "text": RESPONSE_TEXT}]
+                    payload["words"] = []
+                data = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up waiting, as it does with a slow endpoint
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/transcribe"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock Whisper endpoint.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per request")
+    parser.add_argument("--status", type=int, default=200, help="HTTP status to answer with")
+    args = parser.parse_args()
+
+    server = MockWhisperServer(args.latency, args.jitter, args.port, args.status)
+    print(f"Listening on {server.url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
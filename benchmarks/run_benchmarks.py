@@ -0,0 +1,381 @@
+"""
+Benchmark the conversion, transcription and cleaning pipeline.
+
+Synthetic speech-like fixtures are generated for every supported format
+and duration, and each stage runs in a fresh process against a local mock
+Whisper server, so the peak RSS reported is that stage's own.
+
+    python benchmarks/run_benchmarks.py --durations 10,60 --save baseline.json
+    python benchmarks/run_benchmarks.py --compare baseline.json
+
+The transcription cache is disabled so every iteration does the full work.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcriber  # noqa: E402
+from live_transcription import TranscriptStitcher, normalize  # noqa: E402
+from mock_whisper import MockWhisperServer  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is reported as None there
+    resource = None
+
+# pydub export arguments per upload extension
+EXPORT_ARGS = {
+    "mp3": {"format": "mp3"},
+    "mpga": {"format": "mp3"},
+    "mp4": {"format": "mp4", "codec": "aac"},
+    "m4a": {"format": "ipod", "codec": "aac"},
+    "mpeg": {"format": "mpeg", "codec": "mp2"},
+    "wav": {"format": "wav"},
+    "webm": {"format": "webm", "codec": "libopus"},
+}
+AUDIO_STAGES = ["probe", "convert_to_wav", "convert_to_wav_pydub", "encode_for_upload", "transcribe_audio",
+                "transcribe_file"]
+TEXT_STAGES = ["clean_transcription", "stitch_windows"]
+# Roughly the speaking rate of a conversation
+WORDS_PER_SECOND = 2.5
+# Synthetic live sessions per stitching benchmark, cut into windows of
+# about six seconds of speech
+STITCH_SESSIONS = 50
+WINDOW_WORDS = 15
+FILLER_WORDS = ["um", "uh", "so", "like", "i", "think", "its", "dont", "[music]", "♪", "okay", "right"]
+
+
+def speech_like(duration_ms, seed=0):
+    """Syllable-length tones with pauses, close enough to speech for the pipeline."""
+    from pydub import AudioSegment
+    from pydub.generators import Sine
+
+    rng = random.Random(seed)
+    pattern = AudioSegment.silent(0, frame_rate=16000)
+    while len(pattern) < min(duration_ms, 10000):
+        for _ in range(rng.randint(4, 9)):
+            tone = Sine(rng.uniform(120, 400), sample_rate=16000).to_audio_segment(duration=rng.randint(120, 320))
+            pattern += tone.apply_gain(rng.uniform(-24, -12)).fade_in(20).fade_out(20)
+        pattern += AudioSegment.silent(rng.randint(250, 900), frame_rate=16000)
+    audio = pattern * (duration_ms // len(pattern) + 1)
+    return audio[:duration_ms]
+
+
+def transcript_like(duration, seed=0):
+    rng = random.Random(seed)
+    words = []
+    for index in range(int(duration * WORDS_PER_SECOND)):
+        word = rng.choice(FILLER_WORDS) if rng.random() < 0.3 else f"word{rng.randint(0, 500)}"
+        words.append(word + ("." if index % 12 == 11 else ""))
+    return " ".join(words)
+
+
+def overlapping_windows(text, seed=0, window_words=WINDOW_WORDS):
+    """
+    Cut a transcript into overlapping windows with the noise real seams have.
+
+    Neighbouring windows share 3 to 6 words. Words at a window edge are
+    cut in half or lost, as when the boundary falls inside a word, the last
+    word before a seam sometimes gets a full stop and the first after it a
+    capital.
+    """
+    rng = random.Random(seed)
+    words = text.split()
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window_words, len(words))
+        windows.append(words[start:end])
+        if end == len(words):
+            break
+        start = end - rng.randint(3, 6)
+
+    for index, window in enumerate(windows):
+        if index + 1 < len(windows):
+            if rng.random() < 0.4:
+                if len(window[-1]) >= 4 and rng.random() < 0.5:
+                    window[-1] = window[-1][:len(window[-1]) // 2]
+                else:
+                    window.pop()
+            if rng.random() < 0.5:
+                window[-1] += "."
+        if index:
+            if rng.random() < 0.4:
+                if len(window[0]) >= 4 and rng.random() < 0.5:
+                    window[0] = window[0][len(window[0]) // 2:]
+                else:
+                    window.pop(0)
+            if rng.random() < 0.3:
+                window[0] = window[0].capitalize()
+    return [" ".join(window) for window in windows]
+
+
+def stitch(windows):
+    stitcher = TranscriptStitcher()
+    for window in windows:
+        stitcher.add(window)
+    return stitcher.text
+
+
+def mismatched_words(sessions, stitched):
+    """Words missing or repeated in stitched sessions, against the text they were cut from."""
+    from difflib import SequenceMatcher
+
+    mismatched = 0
+    for (text, _), result in zip(sessions, stitched):
+        expected = [normalize(word) for word in text.split()]
+        actual = [normalize(word) for word in result.split()]
+        for tag, first, last, other_first, other_last in SequenceMatcher(None, expected, actual).get_opcodes():
+            if tag != "equal":
+                mismatched += max(last - first, other_last - other_first)
+    return mismatched
+
+
+def convert_to_wav_pydub(audio_file):
+    """The same conversion as convert_to_wav done with pydub, for comparison."""
+    audio = transcriber.decode_audio(audio_file)
+    audio = audio.set_channels(1).set_frame_rate(transcriber.COMPRESSED_SAMPLE_RATE).set_sample_width(2)
+    audio = audio.remove_dc_offset()
+    audio = audio.apply_gain(transcriber.TARGET_LOUDNESS_DBFS - audio.dBFS)
+    wav_io = BytesIO()
+    audio.export(wav_io, format="wav")
+    wav_io.seek(0)
+    return wav_io
+
+
+def build_fixtures(directory, formats, durations, sample_rate=16000, channels=1):
+    """
+    Write one fixture file per format and duration.
+
+    Returns:
+        list: (extension, duration in seconds, path) triples
+    """
+    fixtures = []
+    for duration in durations:
+        audio = speech_like(duration * 1000).set_frame_rate(sample_rate).set_channels(channels)
+        for extension in formats:
+            path = os.path.join(directory, f"fixture_{duration}s_{sample_rate}hz_{channels}ch.{extension}")
+            if not os.path.exists(path):
+                audio.export(path, **EXPORT_ARGS[extension])
+            fixtures.append((extension, duration, path))
+    return fixtures
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2 ** 20
+    return own, children
+
+
+def _stage_call(stage, payload):
+    if stage == "clean_transcription":
+        return lambda: transcriber.clean_transcription(payload)
+    if stage == "stitch_windows":
+        return lambda: [stitch(windows) for _, windows in payload]
+
+    def upload():
+        audio_file = BytesIO(payload[1])
+        audio_file.name = payload[0]
+        return audio_file
+
+    if stage == "probe":
+        return lambda: transcriber.get_audio_info(upload())
+    if stage == "convert_to_wav":
+        return lambda: transcriber.convert_to_wav(upload())
+    if stage == "convert_to_wav_pydub":
+        return lambda: convert_to_wav_pydub(upload())
+    if stage == "encode_for_upload":
+        return lambda: transcriber.encode_for_upload(upload())
+
+    def transcribe():
+        run = transcriber.transcribe_audio if stage == "transcribe_audio" else transcriber.transcribe_file
+        success, message = run(upload())
+        if not success:
+            raise RuntimeError(message)
+    return transcribe
+
+
+def measure(stage, source, iterations, api_url, cache_dir):
+    """
+    Time one stage on one fixture. Runs in its own process.
+
+    Returns:
+        dict: Latencies in seconds and peak RSS in MB
+    """
+    # Zero budgets make every cache lookup miss
+    transcriber.CACHE_MEMORY_BYTES = 0
+    transcriber.CACHE_DISK_BYTES = 0
+    transcriber.configure(api_url=api_url, endpoints=[], cache_dir=cache_dir)
+
+    if stage in TEXT_STAGES:
+        payload = source
+    else:
+        with open(source, "rb") as f:
+            payload = (os.path.basename(source), f.read())
+    call = _stage_call(stage, payload)
+
+    # Warm-up: imports, ffmpeg page cache, connection setup
+    output = call()
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+
+    own, children = _peak_rss_mb()
+    measurement = {"latencies": latencies, "peak_rss_mb": own, "peak_child_rss_mb": children}
+    if stage == "stitch_windows":
+        measurement["mismatched_words"] = mismatched_words(payload, output)
+    return measurement
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(measurement, audio_seconds):
+    latencies = measurement["latencies"]
+    p50 = statistics.median(latencies)
+    summary = {
+        "iterations": len(latencies),
+        "p50": p50,
+        "p95": _percentile(latencies, 0.95),
+        # Seconds of audio handled per second of wall time
+        "throughput": audio_seconds / p50 if p50 else None,
+        "peak_rss_mb": measurement["peak_rss_mb"],
+        "peak_child_rss_mb": measurement["peak_child_rss_mb"],
+    }
+    if "mismatched_words" in measurement:
+        summary["mismatched_words"] = measurement["mismatched_words"]
+    return summary
+
+
+def run(stages, formats, durations, iterations, latency, fixture_dir, fixture_rate=16000, fixture_channels=1):
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    with MockWhisperServer(latency=latency) as server, tempfile.TemporaryDirectory() as cache_dir:
+        jobs = []
+        if any(stage in AUDIO_STAGES for stage in stages):
+            for extension, duration, path in build_fixtures(fixture_dir, formats, durations, fixture_rate, fixture_channels):
+                jobs += [(stage, f"{stage}/{extension}/{duration}s", path, duration)
+                         for stage in stages if stage in AUDIO_STAGES]
+        if "clean_transcription" in stages:
+            jobs += [("clean_transcription", f"clean_transcription/txt/{duration}s",
+                      transcript_like(duration), duration) for duration in durations]
+        if "stitch_windows" in stages:
+            for duration in durations:
+                sessions = [(text, overlapping_windows(text, seed)) for seed, text in
+                            ((seed, transcript_like(duration, seed)) for seed in range(STITCH_SESSIONS))]
+                jobs.append(("stitch_windows", f"stitch_windows/txt/{duration}s", sessions,
+                             duration * STITCH_SESSIONS))
+
+        for stage, name, source, duration in jobs:
+            with context.Pool(1) as pool:
+                measurement = pool.apply(measure, (stage, source, iterations, server.url, cache_dir))
+            results[name] = summarize(measurement, duration)
+            print(format_row(name, results[name]), flush=True)
+    return results
+
+
+def format_row(name, result, baseline=None):
+    row = (f"{name:<42} p50 {result['p50'] * 1000:9.1f}ms  p95 {result['p95'] * 1000:9.1f}ms  "
+           f"{result['throughput'] or 0:8.1f}x  rss {result['peak_rss_mb'] or 0:7.1f}MB")
+    if "mismatched_words" in result:
+        row += f"  mismatched {result['mismatched_words']} words"
+    if baseline:
+        change = (result["p50"] - baseline["p50"]) / baseline["p50"] * 100
+        row += f"  {change:+6.1f}%"
+    return row
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print p50 changes against a baseline.
+
+    Returns:
+        list: Names of benchmarks slower than the tolerance allows, or
+            getting more words wrong than the baseline did
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        print(format_row(name, result, previous))
+        if not previous:
+            continue
+        if result["p50"] > previous["p50"] * (1 + tolerance):
+            regressions.append(name)
+        elif "mismatched_words" in previous and result["mismatched_words"] > previous["mismatched_words"]:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AudioInk pipeline.")
+    parser.add_argument("--stages", default=",".join(AUDIO_STAGES + TEXT_STAGES),
+                        help="comma-separated stages to run")
+    parser.add_argument("--formats", default=",".join(transcriber.SUPPORTED_FORMATS),
+                        help="comma-separated fixture formats")
+    parser.add_argument("--durations", default="10,60,300", help="comma-separated fixture lengths in seconds")
+    parser.add_argument("--iterations", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock API latency in seconds")
+    parser.add_argument("--fixture-dir", help="keep generated fixtures here between runs")
+    parser.add_argument("--fixture-rate", type=int, default=16000, help="fixture sample rate in Hz")
+    parser.add_argument("--fixture-channels", type=int, default=1, help="fixture channel count")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against results saved earlier")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed p50 slowdown against the baseline, as a fraction")
+    args = parser.parse_args(argv)
+
+    stages = args.stages.split(",")
+    formats = args.formats.split(",")
+    durations = [int(duration) for duration in args.durations.split(",")]
+
+    if args.fixture_dir:
+        os.makedirs(args.fixture_dir, exist_ok=True)
+        results = run(stages, formats, durations, args.iterations, args.latency, args.fixture_dir,
+                      args.fixture_rate, args.fixture_channels)
+    else:
+        with tempfile.TemporaryDirectory() as fixture_dir:
+            results = run(stages, formats, durations, args.iterations, args.latency, fixture_dir,
+                          args.fixture_rate, args.fixture_channels)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "latency": args.latency,
+                "results": results
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        print()
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Command-line entry point for the AudioInk transcription engine.
+
+    python cli.py meeting.m4a voicemails/ --output-dir transcripts
+    python cli.py --clean-only raw_transcript.txt
+    python cli.py --search "quarterly budget"
+
+API settings are read from AZURE_WHISPER_API_URL and AZURE_API_KEY, or from
+WHISPER_ENDPOINTS for several deployments.
+"""
+import argparse
+import os
+import sys
+
+import transcriber
+
+
+def collect_inputs(paths, extensions):
+    """
+    Expand files and directories into a sorted list of matching files.
+
+    Args:
+        paths (list): File or directory paths
+        extensions (list): Extensions to pick up from directories
+
+    Returns:
+        list: File paths, directories walked recursively
+    """
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, _, names in os.walk(path):
+                for name in names:
+                    if name.split(".")[-1].lower() in extensions:
+                        found.append(os.path.join(root, name))
+            inputs.extend(sorted(found))
+        else:
+            inputs.append(path)
+    return inputs
+
+
+def write_output(path, text, output_dir, show_name, extension="txt"):
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        base_name = os.path.splitext(os.path.basename(path))[0]
+        with open(os.path.join(output_dir, f"{base_name}.{extension}"), "w", encoding="utf-8") as f:
+            f.write(text)
+    elif show_name:
+        print(f"==> {path} <==")
+        print(text)
+    else:
+        print(text)
+
+
+def search(query):
+    index = transcriber.get_search_index()
+    if index is None:
+        print("The search index is turned off.", file=sys.stderr)
+        return 1
+    hits = index.search(query)
+    for hit in hits:
+        where = f" @ {hit.start:.1f}s" if hit.start is not None else ""
+        print(f"{hit.name}{where}: {hit.snippet}")
+    return 0 if hits else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe audio files with AudioInk.")
+    parser.add_argument("paths", nargs="+", help="audio files or directories to transcribe")
+    parser.add_argument("-o", "--output-dir", help="write one .txt per input here instead of printing")
+    parser.add_argument("--clean-only", action="store_true",
+                        help="treat inputs as raw transcript text and only clean them")
+    parser.add_argument("--search", action="store_true",
+                        help="treat the arguments as a query over past transcripts")
+    parser.add_argument("--encoding", choices=["auto", "stream", "wav"],
+                        help="upload encoding, overrides UPLOAD_ENCODING")
+    parser.add_argument("--vad", action="store_true",
+                        help="drop silence with voice-activity detection before upload")
+    parser.add_argument("--local", action="store_true",
+                        help="transcribe on this machine with faster-whisper instead of the API")
+    parser.add_argument("--local-quality", choices=["fast", "balanced", "accurate"],
+                        help="local model preset, overrides LOCAL_QUALITY")
+    parser.add_argument("-f", "--format", choices=["txt", "srt", "vtt", "json"], default="txt",
+                        help="output format, all but txt carry timestamps")
+    args = parser.parse_args(argv)
+
+    if args.encoding:
+        transcriber.configure(upload_encoding=args.encoding)
+    if args.vad:
+        transcriber.configure(vad_enabled=True)
+    if args.local:
+        transcriber.configure(backend="local")
+    if args.local_quality:
+        transcriber.configure(local_quality=args.local_quality)
+
+    if args.search:
+        return search(" ".join(args.paths))
+
+    extensions = ["txt"] if args.clean_only else transcriber.SUPPORTED_FORMATS
+    inputs = collect_inputs(args.paths, extensions)
+    show_name = len(inputs) > 1
+    failures = 0
+
+    for path in inputs:
+        if args.clean_only:
+            with open(path, "r", encoding="utf-8") as f:
+                write_output(path, transcriber.clean_transcription(f.read()), args.output_dir, show_name)
+            continue
+
+        with open(path, "rb") as audio_file:
+            valid, message = transcriber.validate_file(audio_file)
+            if valid:
+                timestamps = args.format != "txt"
+                success, message = transcriber.transcribe_file(audio_file, timestamps=timestamps)
+                if success and timestamps:
+                    message = getattr(message, f"to_{args.format}")()
+            else:
+                success = False
+        if success:
+            write_output(path, message, args.output_dir, show_name, args.format)
+        else:
+            failures += 1
+            print(f"{path}: {message}", file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+import glob
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+
+BLOCK_SIZE = 64 * 1024
+PROBE_TIMEOUT = 15
+
+# Containers whose index may sit at the end of the file cannot be decoded
+# from a pipe, so they are spooled to a temporary file first
+SEEKABLE_FORMATS = {"mp4", "m4a"}
+
+# Upload extensions that aren't ffmpeg demuxer names
+DEMUXER_NAMES = {"mpga": "mp3"}
+
+
+def demuxer_name(extension):
+    return DEMUXER_NAMES.get(extension, extension)
+
+
+def ffmpeg_binary():
+    return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def ffprobe_binary():
+    return shutil.which("ffprobe") or "ffprobe"
+
+
+class AudioInfo:
+    """
+    Container-level facts about an audio file, read without decoding it.
+
+    Args:
+        duration (float): Length in seconds, or None if the container doesn't say
+        codec (str): ffmpeg name of the audio codec
+        sample_rate (int): Samples per second
+        channels (int): Channel count
+        format_name (str): ffmpeg name of the container format
+    """
+
+    __slots__ = ("duration", "codec", "sample_rate", "channels", "format_name")
+
+    def __init__(self, duration, codec, sample_rate, channels, format_name):
+        self.duration = duration
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.format_name = format_name
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+
+def encoding_args(output_format, sample_rate, bitrate):
+    args = ["-vn", "-ac", "1", "-ar", str(sample_rate)]
+    if output_format == "wav":
+        args += ["-c:a", "pcm_s16le"]
+    elif bitrate:
+        args += ["-b:a", bitrate]
+    return args
+
+
+def _pump(source, sink, block_size):
+    try:
+        while True:
+            block = source.read(block_size)
+            if not block:
+                break
+            sink.write(block)
+    except (BrokenPipeError, ValueError):
+        # ffmpeg exited early, its exit status carries the error
+        pass
+    finally:
+        try:
+            sink.close()
+        except OSError:
+            pass
+
+
+def _drain(stream, collected):
+    collected.append(stream.read())
+
+
+def _spool(audio_file, suffix, block_size):
+    spool = tempfile.NamedTemporaryFile(suffix=f".{suffix}", delete=False)
+    with spool:
+        audio_file.seek(0)
+        _pump(audio_file, spool, block_size)
+    audio_file.seek(0)
+    return spool.name
+
+
+def _input_args(audio_file, block_size):
+    """Return ffmpeg input arguments, an optional spool path to remove and whether to pipe the audio in."""
+    path = disk_path(audio_file)
+    if path is not None:
+        return ["-i", path], None, False
+    input_format = audio_file.name.split(".")[-1].lower()
+    if input_format in SEEKABLE_FORMATS:
+        spool_path = _spool(audio_file, input_format, block_size)
+        return ["-i", spool_path], spool_path, False
+    return ["-i", "pipe:0"], None, True
+
+
+@contextmanager
+def input_path(audio_file, block_size=BLOCK_SIZE):
+    """
+    Path ffmpeg can read an upload from, spooled for as long as the block
+    runs when the container can't be decoded from a pipe.
+
+    Yields:
+        str: A path, or None when the audio can be piped in
+    """
+    input_args, spool_path, piped = _input_args(audio_file, block_size)
+    try:
+        yield None if piped else input_args[1]
+    finally:
+        if spool_path is not None:
+            os.remove(spool_path)
+
+
+def disk_path(audio_file):
+    """Path of a file-like object that is a real file on disk, else None."""
+    try:
+        audio_file.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    name = getattr(audio_file, "name", None)
+    return name if isinstance(name, str) and os.path.isfile(name) else None
+
+
+def probe_audio(audio_file, block_size=BLOCK_SIZE):
+    """
+    Read duration, codec, sample rate and channels from the container headers.
+
+    ffprobe gets a seekable path, so it reads the headers and index only.
+    In-memory uploads are spooled to a temporary file first.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        block_size (int): Block size used when spooling
+
+    Returns:
+        AudioInfo: The probed facts
+
+    Raises:
+        RuntimeError: If the file can't be parsed or has no audio stream
+    """
+    path = disk_path(audio_file)
+    spool_path = None
+    if path is None:
+        spool_path = path = _spool(audio_file, audio_file.name.split(".")[-1].lower(), block_size)
+    command = [ffprobe_binary(), "-v", "error", "-select_streams", "a:0",
+               "-show_entries", "format=duration,format_name:stream=codec_name,sample_rate,channels,duration",
+               "-of", "json", path]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=PROBE_TIMEOUT)
+    finally:
+        if spool_path is not None:
+            os.remove(spool_path)
+
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", "replace").strip().splitlines()
+        message = message[-1].replace(f"{path}: ", "") if message else f"ffprobe exited with {result.returncode}"
+        raise RuntimeError(message)
+    data = json.loads(result.stdout or b"{}")
+    streams = data.get("streams") or []
+    if not streams:
+        raise RuntimeError("No audio stream found")
+
+    stream = streams[0]
+    container = data.get("format") or {}
+    duration = container.get("duration") or stream.get("duration")
+    try:
+        duration = float(duration)
+    except (TypeError, ValueError):
+        duration = None
+    return AudioInfo(
+        duration=duration,
+        codec=stream.get("codec_name"),
+        sample_rate=int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+        channels=stream.get("channels"),
+        format_name=container.get("format_name")
+    )
+
+
+def stream_transcode(audio_file, output_format="mp3", sample_rate=16000, bitrate="32k",
+                     block_size=BLOCK_SIZE):
+    """
+    Transcode audio through an ffmpeg pipe, yielding fixed-size output blocks.
+
+    The upload is fed to ffmpeg block by block from a writer thread, so only
+    a few blocks are held in memory regardless of the recording length.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        output_format (str): ffmpeg output format, e.g. ``mp3`` or ``wav``
+        sample_rate (int): Output sample rate in Hz
+        bitrate (str): Output bitrate for compressed formats
+        block_size (int): Size of the blocks read and yielded
+
+    Yields:
+        bytes: Encoded output blocks in order
+    """
+    yield from _pipe_output(
+        audio_file, [*encoding_args(output_format, sample_rate, bitrate), "-f", output_format], block_size
+    )
+
+
+def decode_pcm(audio_file, sample_rate, channels, block_size=BLOCK_SIZE):
+    """
+    Decode audio to raw 16-bit little-endian PCM through an ffmpeg pipe.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        sample_rate (int): Output sample rate in Hz, the source's own to avoid resampling
+        channels (int): Output channel count, the source's own to avoid mixing
+        block_size (int): Size of the blocks read from ffmpeg
+
+    Returns:
+        bytearray: Interleaved samples
+    """
+    pcm = bytearray()
+    for block in _pipe_output(audio_file, ["-vn", "-ac", str(channels), "-ar", str(sample_rate),
+                                           "-c:a", "pcm_s16le", "-f", "s16le"], block_size):
+        pcm += block
+    return pcm
+
+
+def _pipe_output(audio_file, output_args, block_size):
+    input_args, spool_path, piped = _input_args(audio_file, block_size)
+    command = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", *input_args, *output_args, "pipe:1"]
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE if piped else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+
+    errors = []
+    threads = [threading.Thread(target=_drain, args=(process.stderr, errors), daemon=True)]
+    if piped:
+        audio_file.seek(0)
+        threads.append(threading.Thread(target=_pump, args=(audio_file, process.stdin, block_size), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            block = process.stdout.read(block_size)
+            if not block:
+                break
+            yield block
+        process.wait()
+        for thread in threads:
+            thread.join()
+        if process.returncode != 0:
+            message = errors[0].decode("utf-8", "replace").strip() if errors else ""
+            raise RuntimeError(f"ffmpeg failed: {message or process.returncode}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        if spool_path is not None:
+            os.remove(spool_path)
+        audio_file.seek(0)
+
+
+def transcode_to_segments(audio_file, directory, segment_seconds, output_format="mp3",
+                          sample_rate=16000, bitrate="32k", block_size=BLOCK_SIZE):
+    """
+    Transcode audio through an ffmpeg pipe into fixed-length chunk files.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        directory (str): Directory the chunk files are written to
+        segment_seconds (int): Length of each chunk in seconds
+        output_format (str): ffmpeg output format of the chunks
+        sample_rate (int): Output sample rate in Hz
+        bitrate (str): Output bitrate for compressed formats
+        block_size (int): Size of the blocks fed to ffmpeg
+
+    Returns:
+        list: Paths of the chunk files in playback order
+    """
+    input_args, spool_path, piped = _input_args(audio_file, block_size)
+    base_name = os.path.splitext(os.path.basename(audio_file.name))[0]
+    pattern = os.path.join(directory, f"{base_name}_part%03d.{output_format}")
+    command = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", *input_args,
+               *encoding_args(output_format, sample_rate, bitrate),
+               "-f", "segment", "-segment_time", str(segment_seconds),
+               "-segment_format", output_format, "-reset_timestamps", "1", pattern]
+    try:
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if piped else subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        errors = []
+        drainer = threading.Thread(target=_drain, args=(process.stderr, errors), daemon=True)
+        drainer.start()
+        if piped:
+            audio_file.seek(0)
+            _pump(audio_file, process.stdin, block_size)
+        process.wait()
+        drainer.join()
+        if process.returncode != 0:
+            message = errors[0].decode("utf-8", "replace").strip() if errors else ""
+            raise RuntimeError(f"ffmpeg failed: {message or process.returncode}")
+    finally:
+        if spool_path is not None:
+            os.remove(spool_path)
+        audio_file.seek(0)
+
+    return sorted(glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(base_name)}_part*.{output_format}")))
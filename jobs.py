@@ -0,0 +1,114 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """
+    A unit of background work and its progress.
+
+    Args:
+        job_id (str): Identifier handed back to the caller
+    """
+
+    __slots__ = ("job_id", "stage", "created", "finished", "future")
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.stage = "Queued"
+        self.created = time.time()
+        self.finished = None
+        self.future = None
+
+    def set_stage(self, stage):
+        self.stage = stage
+
+    @property
+    def status(self):
+        if self.future is None or not (self.future.running() or self.future.done()):
+            return "queued"
+        if not self.future.done():
+            return "running"
+        if self.future.cancelled():
+            return "cancelled"
+        return "failed" if self.future.exception() is not None else "done"
+
+    def result(self):
+        return self.future.result()
+
+
+class JobManager:
+    """
+    Process-wide worker pool whose jobs outlive the script run that started them.
+
+    Args:
+        max_workers (int): Jobs running at the same time across all sessions
+        ttl (float): Seconds finished jobs are kept for pickup
+    """
+
+    def __init__(self, max_workers=4, ttl=3600.0):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audioink-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, work):
+        """
+        Queue work for a worker thread.
+
+        Args:
+            work: Callable taking the Job, so it can report its stage
+
+        Returns:
+            str: The job ID
+        """
+        job = Job(uuid.uuid4().hex)
+
+        def run():
+            try:
+                return work(job)
+            finally:
+                job.finished = time.time()
+
+        def cancelled(future):
+            # A cancelled job never runs, so it is marked finished here for pruning
+            if future.cancelled():
+                job.finished = time.time()
+
+        with self._lock:
+            self._prune()
+            self._jobs[job.job_id] = job
+            job.future = self._executor.submit(run)
+            job.future.add_done_callback(cancelled)
+        return job.job_id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def discard(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def cancel(self, job_id):
+        """
+        Forget a job, stopping it if it hasn't started yet.
+
+        Returns:
+            bool: Whether the job was stopped before it started
+        """
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        return job is not None and job.future.cancel()
+
+    def queue_depth(self):
+        with self._lock:
+            return sum(job.status == "queued" for job in self._jobs.values())
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and job.finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
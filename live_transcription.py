@@ -0,0 +1,212 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from pydub import AudioSegment
+
+WORD_PATTERN = re.compile(r"[^\w']+")
+
+
+def normalize(token):
+    """A word as the stitcher compares it: lowercase, without punctuation."""
+    return WORD_PATTERN.sub("", token).lower()
+
+
+# Words either side of a seam searched for the repeated audio
+MAX_OVERLAP_WORDS = 20
+# A single repeated word only counts as the overlap when at most this many
+# words around it are thrown away, e.g. words the window edges cut in half
+MAX_SEAM_NOISE_WORDS = 2
+# Each word a candidate overlap would throw away counts against it as this
+# fraction of a matched word, so a phrase repeated further back doesn't eat
+# the text after it
+DROP_PENALTY = 0.25
+
+
+def align_seam(left_tail, right_head):
+    """
+    Find where two windows' transcripts repeat each other.
+
+    The overlap is the run of equal normalized words that best trades its
+    length against the words it throws away around it. A lone word must
+    sit right at the seam, so common words elsewhere don't match. Takes
+    time proportional to the product of the two lengths.
+
+    Args:
+        left_tail (list): Normalized last words of the earlier transcript
+        right_head (list): Normalized first words of the later transcript
+
+    Returns:
+        tuple: (words of ``left_tail`` to keep, words of ``right_head`` to
+            skip), which is (len(left_tail), 0) when nothing repeats
+    """
+    best = None
+    previous = [0] * (len(right_head) + 1)
+    for left_end, token in enumerate(left_tail, 1):
+        current = [0] * (len(right_head) + 1)
+        for right_end, other in enumerate(right_head, 1):
+            if token != other:
+                continue
+            length = current[right_end] = previous[right_end - 1] + 1
+            dropped = len(left_tail) - left_end + right_end - length
+            score = length - DROP_PENALTY * dropped
+            if score <= 0 or (length == 1 and dropped > MAX_SEAM_NOISE_WORDS):
+                continue
+            if best is None or score > best[0]:
+                best = (score, length, left_end, right_end)
+        previous = current
+    if best is None:
+        return len(left_tail), 0
+    _, length, left_end, right_end = best
+    # Switch windows halfway through the repeat, each is least reliable at its edges
+    half = length // 2
+    return left_end - length + half, right_end - length + half
+
+
+class TranscriptStitcher:
+    """
+    Join the transcripts of overlapping windows one after another.
+
+    Each window's words are normalized once, and each seam is aligned
+    within MAX_OVERLAP_WORDS words either side, so stitching takes time
+    linear in the length of the transcript however many windows it has.
+
+    Args:
+        max_overlap_words (int): Longest seam to look for, in words
+    """
+
+    def __init__(self, max_overlap_words=MAX_OVERLAP_WORDS):
+        self.max_overlap_words = max_overlap_words
+        self._words = []
+        self._tokens = []
+        self._text = ""
+
+    def add(self, text):
+        """
+        Append the next window's transcript, dropping what repeats the previous one.
+
+        Args:
+            text (str): Raw transcript of the window
+        """
+        words = text.split()
+        if not words:
+            return
+        tokens = [normalize(word) for word in words]
+        start = max(len(self._words) - self.max_overlap_words, 0)
+        keep, skip = align_seam(self._tokens[start:], tokens[:self.max_overlap_words])
+        del self._words[start + keep:]
+        del self._tokens[start + keep:]
+        self._words.extend(words[skip:])
+        self._tokens.extend(tokens[skip:])
+        self._text = None
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = " ".join(self._words)
+        return self._text
+
+
+def merge_overlap(left, right, max_overlap_words=MAX_OVERLAP_WORDS):
+    """
+    Join two transcripts whose audio overlapped, dropping the repeated words.
+
+    Args:
+        left (str): Transcript of the earlier window
+        right (str): Transcript of the later window
+        max_overlap_words (int): Longest seam to look for, in words
+
+    Returns:
+        str: The joined transcript
+    """
+    stitcher = TranscriptStitcher(max_overlap_words)
+    stitcher.add(left)
+    stitcher.add(right)
+    return stitcher.text
+
+
+class RollingWindowTranscriber:
+    """
+    Cut incoming audio into overlapping windows and transcribe each one as
+    soon as it closes.
+
+    Args:
+        transcribe: Callable taking a file-like WAV and returning
+            ``(success, raw text or error message)``
+        window_ms (int): Length of each window in milliseconds
+        overlap_ms (int): Audio shared between neighbouring windows
+        max_workers (int): Windows transcribed at the same time
+        frame_rate (int): Sample rate windows are sent at
+    """
+
+    def __init__(self, transcribe, window_ms=6000, overlap_ms=1500, max_workers=2, frame_rate=16000):
+        self.transcribe = transcribe
+        self.window_ms = window_ms
+        self.step_ms = window_ms - overlap_ms
+        self.frame_rate = frame_rate
+        self.errors = []
+        self._buffer = AudioSegment.empty()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = []
+        self._stitcher = TranscriptStitcher()
+        self._merged_count = 0
+        self._lock = threading.Lock()
+
+    def feed(self, segment):
+        """
+        Append audio and submit every window that is now complete.
+
+        Args:
+            segment (AudioSegment): Newly captured audio
+        """
+        self._buffer += segment.set_frame_rate(self.frame_rate).set_channels(1)
+        while len(self._buffer) >= self.window_ms:
+            self._submit(self._buffer[:self.window_ms])
+            self._buffer = self._buffer[self.step_ms:]
+
+    def flush(self):
+        """Submit whatever audio is left as a final, shorter window."""
+        overlap_ms = self.window_ms - self.step_ms
+        if self._futures and len(self._buffer) <= overlap_ms:
+            # Only the tail the previous window already covered
+            self._buffer = AudioSegment.empty()
+            return
+        if len(self._buffer) > 0:
+            self._submit(self._buffer)
+            self._buffer = AudioSegment.empty()
+
+    def _submit(self, window):
+        window_io = BytesIO()
+        window.export(window_io, format="wav")
+        window_io.seek(0)
+        window_io.name = f"live_{len(self._futures):05d}.wav"
+        self._futures.append(self._executor.submit(self.transcribe, window_io))
+
+    def poll(self):
+        """
+        Stitch every finished window that follows the text so far.
+
+        Returns:
+            str: The raw transcript of all windows finished in order
+        """
+        with self._lock:
+            while self._merged_count < len(self._futures) and self._futures[self._merged_count].done():
+                try:
+                    success, result = self._futures[self._merged_count].result()
+                except Exception as e:
+                    success, result = False, f"Transcription error: {str(e)}"
+                if success:
+                    self._stitcher.add(result)
+                else:
+                    self.errors.append(result)
+                self._merged_count += 1
+            return self._stitcher.text
+
+    @property
+    def pending(self):
+        return len(self._futures) - self._merged_count
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        return self.poll()
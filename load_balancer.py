@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+
+from whisper_client import RETRY_STATUS_CODES
+
+logger = logging.getLogger(__name__)
+
+# Assumed latency of an endpoint before it has answered, in seconds per
+# second of audio sent
+DEFAULT_LATENCY = 0.1
+# Below this many requests the error rate alone doesn't eject an endpoint
+MIN_REQUESTS_FOR_ERROR_RATE = 5
+
+
+class Endpoint:
+    """
+    One Whisper deployment and its running health estimates. Latency is
+    kept per second of audio, so long chunks don't make an endpoint look slow.
+
+    Args:
+        client: WhisperClient for the deployment
+        weight (float): Relative share of traffic at equal latency and load
+    """
+
+    __slots__ = ("client", "weight", "latency", "error_rate", "requests", "in_flight",
+                 "consecutive_failures", "ejected_until", "ejections")
+
+    def __init__(self, client, weight=1.0):
+        self.client = client
+        self.weight = weight
+        self.latency = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+
+class EndpointPool:
+    """
+    Spread Whisper requests over several deployments.
+
+    Each request goes to the endpoint with the lowest expected cost: its
+    latency estimate scaled by requests in flight, weight and error rate,
+    so concurrent chunks of one file fan out across regions. Endpoints that
+    fail repeatedly are ejected for a cooldown that doubles on each repeat,
+    and a failed request is retried once on every other endpoint.
+
+    Args:
+        endpoints (list): (WhisperClient, weight) pairs
+        smoothing (float): Weight of the newest sample in the running estimates
+        eject_after (int): Consecutive failures that eject an endpoint
+        eject_error_rate (float): Error rate that ejects an endpoint
+        eject_seconds (float): First ejection cooldown
+        max_eject_seconds (float): Longest ejection cooldown
+    """
+
+    def __init__(self, endpoints, smoothing=0.2, eject_after=3, eject_error_rate=0.5,
+                 eject_seconds=30.0, max_eject_seconds=300.0):
+        self.endpoints = [Endpoint(client, weight) for client, weight in endpoints]
+        self.smoothing = smoothing
+        self.eject_after = eject_after
+        self.eject_error_rate = eject_error_rate
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self._lock = threading.Lock()
+
+    def _score(self, endpoint, default_latency):
+        latency = endpoint.latency if endpoint.latency is not None else default_latency
+        return latency * (1 + endpoint.in_flight) / endpoint.weight / max(1 - endpoint.error_rate, 0.05)
+
+    def _pick(self, tried):
+        now = time.monotonic()
+        untried = [endpoint for endpoint in self.endpoints if endpoint not in tried]
+        candidates = [endpoint for endpoint in untried if endpoint.ejected_until <= now]
+        if not candidates:
+            # Everything left is ejected, so try the one that recovers first
+            return min(untried, key=lambda endpoint: endpoint.ejected_until)
+
+        measured = [endpoint.latency for endpoint in self.endpoints if endpoint.latency is not None]
+        default_latency = sum(measured) / len(measured) if measured else DEFAULT_LATENCY
+        return min(candidates, key=lambda endpoint: self._score(endpoint, default_latency))
+
+    def _record(self, endpoint, elapsed, ok, audio_seconds):
+        endpoint.in_flight -= 1
+        endpoint.requests += 1
+        endpoint.error_rate += self.smoothing * ((0.0 if ok else 1.0) - endpoint.error_rate)
+        if ok:
+            # Requests of unknown length can't be compared with the rest
+            if audio_seconds:
+                latency = elapsed / audio_seconds
+                if endpoint.latency is None:
+                    endpoint.latency = latency
+                else:
+                    endpoint.latency += self.smoothing * (latency - endpoint.latency)
+            endpoint.consecutive_failures = 0
+            endpoint.ejections = 0
+            return
+
+        endpoint.consecutive_failures += 1
+        unhealthy = (
+            endpoint.consecutive_failures >= self.eject_after
+            or (endpoint.requests >= MIN_REQUESTS_FOR_ERROR_RATE and endpoint.error_rate >= self.eject_error_rate)
+        )
+        if unhealthy:
+            cooldown = min(self.eject_seconds * 2 ** endpoint.ejections, self.max_eject_seconds)
+            endpoint.ejected_until = time.monotonic() + cooldown
+            endpoint.ejections += 1
+            endpoint.consecutive_failures = 0
+            logger.warning("Ejecting %s for %.0fs", endpoint.client.url, cooldown)
+
+    def _send(self, send, audio_seconds):
+        tried = []
+        response = None
+        error = None
+        while len(tried) < len(self.endpoints):
+            with self._lock:
+                endpoint = self._pick(tried)
+                endpoint.in_flight += 1
+            tried.append(endpoint)
+
+            started = time.monotonic()
+            try:
+                attempt = send(endpoint.client)
+            except Exception as e:
+                with self._lock:
+                    self._record(endpoint, time.monotonic() - started, False, audio_seconds)
+                error = e
+                continue
+
+            ok = attempt.status_code not in RETRY_STATUS_CODES
+            with self._lock:
+                self._record(endpoint, time.monotonic() - started, ok, audio_seconds)
+            if ok:
+                return attempt
+            if response is not None:
+                response.close()
+            response = attempt
+
+        if response is not None:
+            return response
+        raise error
+
+    def post_audio(self, audio_file, data=None, audio_seconds=None):
+        """
+        Upload an audio file to the best endpoint, failing over on errors.
+
+        Args:
+            audio_file: A seekable file-like object with a ``name`` attribute
+            data (dict): Extra form fields for the request
+            audio_seconds (float): Length of the audio, None if unknown
+
+        Returns:
+            requests.Response: The first successful response, else the last one
+        """
+        return self._send(lambda client: client.post_audio(audio_file, data=data), audio_seconds)
+
+    def post_stream(self, filename, make_blocks, data=None, audio_seconds=None):
+        """
+        Upload audio produced on the fly to the best endpoint, failing over on errors.
+
+        Args:
+            filename (str): File name reported to the API
+            make_blocks: Callable returning a fresh iterator of audio blocks
+            data (dict): Extra form fields for the request
+            audio_seconds (float): Length of the audio, None if unknown
+
+        Returns:
+            requests.Response: The first successful response, else the last one
+        """
+        return self._send(lambda client: client.post_stream(filename, make_blocks, data=data), audio_seconds)
+
+    def stats(self):
+        """
+        Client counters summed over all endpoints, plus per-endpoint health.
+
+        Returns:
+            dict: Counter name to value, and ``endpoints`` with one dict each
+        """
+        totals = {}
+        for endpoint in self.endpoints:
+            for name, value in endpoint.client.stats().items():
+                totals[name] = totals.get(name, 0) + value
+
+        now = time.monotonic()
+        with self._lock:
+            totals["endpoints"] = [
+                {
+                    "url": endpoint.client.url,
+                    "weight": endpoint.weight,
+                    "latency": endpoint.latency,
+                    "error_rate": endpoint.error_rate,
+                    "in_flight": endpoint.in_flight,
+                    "ejected": endpoint.ejected_until > now
+                }
+                for endpoint in self.endpoints
+            ]
+        return totals
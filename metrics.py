@@ -0,0 +1,291 @@
+"""
+In-process Prometheus-style metrics for the transcription pipeline.
+
+Stages are timed with trace(), which feeds the stage histograms and
+counters below. render() produces the Prometheus text exposition format,
+served over HTTP by start_http_server() when a metrics port is configured.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(labelnames, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (tuple): Label names, values are passed to inc()
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _format_labels(self.labelnames, key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels.
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (tuple): Label names, values are passed to observe()
+        buckets (tuple): Upper bounds in increasing order
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def label_values(self):
+        with self._lock:
+            return sorted(self._series)
+
+    def snapshot(self, **labels):
+        """
+        Count, sum and estimated quantiles of one labelled series.
+
+        Returns:
+            dict: ``count``, ``sum``, ``p50`` and ``p95``, or None if unobserved
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                return None
+            counts, total, count = list(series[0]), series[1], series[2]
+        return {"count": count, "sum": total,
+                "p50": self._quantile(counts, count, 0.5), "p95": self._quantile(counts, count, 0.95)}
+
+    def _quantile(self, counts, count, q):
+        # Linear interpolation inside the bucket, as Prometheus does
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return 0.0
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, list(counts), total, count) for key, (counts, total, count) in self._series.items())
+        samples = []
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, key), total))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, key), count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Format every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "audioink_stage_duration_seconds", "Time spent in each pipeline stage.", ("stage",)
+))
+STAGE_CALLS = REGISTRY.register(Counter(
+    "audioink_stage_calls_total", "Pipeline stage runs by outcome.", ("stage", "outcome")
+))
+STAGE_BYTES_IN = REGISTRY.register(Counter(
+    "audioink_stage_bytes_in_total", "Bytes handed to each pipeline stage.", ("stage",)
+))
+STAGE_BYTES_OUT = REGISTRY.register(Counter(
+    "audioink_stage_bytes_out_total", "Bytes produced by each pipeline stage.", ("stage",)
+))
+STAGE_AUDIO_SECONDS = REGISTRY.register(Counter(
+    "audioink_stage_audio_seconds_total", "Seconds of audio handled by each pipeline stage.", ("stage",)
+))
+
+
+class Span:
+    """
+    Measurements of one stage run, filled in by the traced code.
+
+    ``outcome`` is set to ``error`` automatically when the stage raises, and
+    can be set by code that reports failure through its return value.
+    """
+
+    __slots__ = ("stage", "bytes_in", "bytes_out", "audio_seconds", "outcome")
+
+    def __init__(self, stage, bytes_in=None, audio_seconds=None):
+        self.stage = stage
+        self.bytes_in = bytes_in
+        self.bytes_out = None
+        self.audio_seconds = audio_seconds
+        self.outcome = "ok"
+
+
+@contextmanager
+def trace(stage, bytes_in=None, audio_seconds=None):
+    """
+    Time a pipeline stage and record what it handled.
+
+    Args:
+        stage (str): Stage label
+        bytes_in (int): Size of the stage input, if known up front
+        audio_seconds (float): Length of the audio handled, if known up front
+
+    Yields:
+        Span: Set ``bytes_out``, ``bytes_in``, ``audio_seconds`` or ``outcome`` on it
+    """
+    span = Span(stage, bytes_in, audio_seconds)
+    started = time.perf_counter()
+    try:
+        yield span
+    except BaseException:
+        span.outcome = "error"
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        STAGE_CALLS.inc(stage=stage, outcome=span.outcome)
+        if span.bytes_in is not None:
+            STAGE_BYTES_IN.inc(span.bytes_in, stage=stage)
+        if span.bytes_out is not None:
+            STAGE_BYTES_OUT.inc(span.bytes_out, stage=stage)
+        if span.audio_seconds:
+            STAGE_AUDIO_SECONDS.inc(span.audio_seconds, stage=stage)
+
+
+def stage_summary():
+    """
+    Per-stage totals for display.
+
+    Returns:
+        list: One dict per traced stage
+    """
+    rows = []
+    for (stage,) in STAGE_SECONDS.label_values():
+        timing = STAGE_SECONDS.snapshot(stage=stage)
+        rows.append({
+            "stage": stage,
+            "calls": timing["count"],
+            "errors": int(STAGE_CALLS.value(stage=stage, outcome="error")),
+            "mean_s": timing["sum"] / timing["count"],
+            "p50_s": timing["p50"],
+            "p95_s": timing["p95"],
+            "bytes_in": int(STAGE_BYTES_IN.value(stage=stage)),
+            "bytes_out": int(STAGE_BYTES_OUT.value(stage=stage)),
+            "audio_s": STAGE_AUDIO_SECONDS.value(stage=stage),
+        })
+    return rows
+
+
+def start_http_server(port, host="0.0.0.0", registry=REGISTRY):
+    """
+    Serve ``/metrics`` for Prometheus from a daemon thread.
+
+    Args:
+        port (int): Port to listen on
+        host (str): Interface to bind
+        registry (Registry): Metrics to serve
+
+    Returns:
+        ThreadingHTTPServer: The running server
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
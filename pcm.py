@@ -0,0 +1,225 @@
+import math
+
+import numpy as np
+
+# Loudness the speech is normalized to, as RMS relative to full scale
+TARGET_LOUDNESS_DBFS = -20.0
+# Quiet recordings are boosted by at most this much, so noise stays noise
+MAX_GAIN_DB = 30.0
+# Peaks are kept this far below full scale after normalization
+PEAK_HEADROOM_DB = 1.0
+# Below this the recording is treated as silence and left alone
+SILENCE_FLOOR_DB = -70.0
+# Resampling works on blocks of about this many input samples, each read
+# with this much context on both sides so block edges don't ring
+RESAMPLE_BLOCK = 32768
+RESAMPLE_MARGIN = 1024
+# Fraction of the new Nyquist frequency passed untouched, the rest of the
+# band tapers off to zero
+RESAMPLE_ROLLOFF = 0.9
+
+
+def to_float(samples, full_scale=32768.0):
+    """Integer PCM samples as float32 in [-1, 1)."""
+    floats = samples.astype(np.float32)
+    floats *= np.float32(1 / full_scale)
+    return floats
+
+
+def to_int16(samples, in_place=False):
+    """
+    Float samples in [-1, 1] as little-endian 16-bit PCM, clipping overshoot.
+    ``in_place`` scales ``samples`` itself instead of a copy.
+    """
+    scaled = samples if in_place else samples.copy()
+    scaled *= np.float32(32767)
+    np.clip(scaled, -32767, 32767, out=scaled)
+    np.rint(scaled, out=scaled)
+    return scaled.astype("<i2")
+
+
+def to_mono(samples, channels, full_scale=32768.0):
+    """
+    Average interleaved integer PCM into one float32 channel in [-1, 1).
+
+    Args:
+        samples (numpy.ndarray): Interleaved samples, frame by frame
+        channels (int): Channel count
+        full_scale (float): Magnitude of a full-scale sample
+
+    Returns:
+        numpy.ndarray: Mono float32 samples
+    """
+    frames = len(samples) // channels
+    mono = samples[0:frames * channels:channels].astype(np.float32)
+    for channel in range(1, channels):
+        mono += samples[channel:frames * channels:channels]
+    mono *= np.float32(1 / (full_scale * channels))
+    return mono
+
+
+def remove_dc(samples):
+    """Subtract the mean in place, which some cheap microphones leave far from zero."""
+    if len(samples):
+        samples -= samples.mean(dtype=np.float64).astype(samples.dtype)
+    return samples
+
+
+def _fast_length(n):
+    """Smallest number of at least ``n`` with no prime factor above 5, which FFTs fastest."""
+    best = None
+    power_of_two = 1
+    while power_of_two < 2 * n:
+        power_of_three = power_of_two
+        while power_of_three < 2 * n:
+            length = power_of_three
+            while length < n:
+                length *= 5
+            best = length if best is None else min(best, length)
+            power_of_three *= 3
+        power_of_two *= 2
+    return best
+
+
+def resample(samples, source_rate, target_rate, block_size=RESAMPLE_BLOCK, margin=RESAMPLE_MARGIN,
+             rolloff=RESAMPLE_ROLLOFF):
+    """
+    Change the sample rate of mono audio in the frequency domain.
+
+    Overlapping blocks are transformed, cut (or zero-padded) to the bins
+    the new rate can hold and transformed back at the new length, which
+    filters and resamples in one step. Block lengths are whole periods of
+    the rate ratio, so every block maps onto a whole number of output
+    samples, and memory stays at a few blocks however long the audio is.
+
+    Args:
+        samples (numpy.ndarray): Mono float32 samples
+        source_rate (int): Current sample rate in Hz
+        target_rate (int): Wanted sample rate in Hz
+        block_size (int): Approximate input samples per block
+        margin (int): Minimum input samples of context on each side of a block
+        rolloff (float): Fraction of the output band passed untouched
+
+    Returns:
+        numpy.ndarray: Resampled float32 samples
+    """
+    if source_rate == target_rate or not len(samples):
+        return samples
+    return resample_blocks(lambda start, stop: samples[start:stop], len(samples), source_rate, target_rate,
+                           block_size, margin, rolloff)
+
+
+def resample_blocks(read, length, source_rate, target_rate, block_size=RESAMPLE_BLOCK, margin=RESAMPLE_MARGIN,
+                    rolloff=RESAMPLE_ROLLOFF):
+    """
+    resample() over audio produced a block at a time, so the input never
+    has to exist in full as float samples.
+
+    Args:
+        read: Callable taking a start and stop input index and returning
+            those mono float32 samples
+        length (int): Input sample count
+        source_rate (int): Current sample rate in Hz
+        target_rate (int): Wanted sample rate in Hz, not ``source_rate``
+        block_size (int): Approximate input samples per block
+        margin (int): Minimum input samples of context on each side of a block
+        rolloff (float): Fraction of the output band passed untouched
+
+    Returns:
+        numpy.ndarray: Resampled float32 samples
+    """
+    divisor = math.gcd(source_rate, target_rate)
+    up, down = target_rate // divisor, source_rate // divisor
+
+    # Sizes in periods of the ratio: ``down`` input samples, ``up`` output samples
+    margin_periods = -(-margin // down)
+    total_periods = _fast_length(max(1, block_size // down) + 2 * margin_periods)
+    block_periods = total_periods - 2 * margin_periods
+    input_length, output_length = down * total_periods, up * total_periods
+    input_step, output_step = down * block_periods, up * block_periods
+    input_margin, output_margin = down * margin_periods, up * margin_periods
+
+    # Raised-cosine taper from the rolloff point to the lower Nyquist frequency
+    bins = min(input_length, output_length) // 2 + 1
+    position = np.arange(bins) / (min(input_length, output_length) / 2)
+    ramp = np.clip((1 - position) / (1 - rolloff), 0, 1)
+    taper = ((0.5 - 0.5 * np.cos(np.pi * ramp)) * (output_length / input_length)).astype(np.float32)
+
+    count = length * up // down
+    resampled = np.empty(count, np.float32)
+    for start, output_start in zip(range(0, length, input_step), range(0, count, output_step)):
+        low = start - input_margin
+        segment = read(max(low, 0), min(low + input_length, length))
+        if len(segment) < input_length:
+            before = max(-low, 0)
+            segment = np.concatenate((
+                np.zeros(before, np.float32), segment,
+                np.zeros(input_length - before - len(segment), np.float32)
+            ))
+        block = np.fft.irfft(np.fft.rfft(segment)[:bins] * taper, output_length)
+        kept = min(output_step, count - output_start)
+        resampled[output_start:output_start + kept] = block[output_margin:output_margin + kept]
+    return resampled
+
+
+def normalize_loudness(samples, target_dbfs=TARGET_LOUDNESS_DBFS, max_gain_db=MAX_GAIN_DB,
+                       headroom_db=PEAK_HEADROOM_DB):
+    """
+    Scale audio in place to a target RMS loudness without clipping its peaks.
+
+    Args:
+        samples (numpy.ndarray): Float samples in [-1, 1]
+        target_dbfs (float): Wanted RMS level relative to full scale
+        max_gain_db (float): Largest boost applied
+        headroom_db (float): Space left between the loudest peak and full scale
+
+    Returns:
+        numpy.ndarray: The scaled samples
+    """
+    if not len(samples):
+        return samples
+    rms = float(np.sqrt(np.dot(samples, samples) / len(samples)))
+    if rms <= 10 ** (SILENCE_FLOOR_DB / 20):
+        return samples
+    gain = min(10 ** ((target_dbfs - 20 * np.log10(rms)) / 20), 10 ** (max_gain_db / 20))
+    peak = max(float(samples.max()), -float(samples.min()))
+    gain = min(gain, 10 ** (-headroom_db / 20) / peak)
+    samples *= np.float32(gain)
+    return samples
+
+
+def preprocess(samples, sample_rate, channels, target_rate=16000, target_dbfs=TARGET_LOUDNESS_DBFS):
+    """
+    Turn decoded PCM into the 16-bit mono audio speech recognition wants.
+
+    Args:
+        samples (numpy.ndarray): Interleaved 16-bit samples
+        sample_rate (int): Their sample rate in Hz
+        channels (int): Their channel count
+        target_rate (int): Output sample rate in Hz
+        target_dbfs (float): Loudness to normalize to, None to keep the level
+
+    Returns:
+        numpy.ndarray: Mono 16-bit samples at ``target_rate``
+    """
+    frames = len(samples) // channels
+    samples = samples[:frames * channels]
+    # The mix's DC offset is the mean over all channels, and taking it from
+    # the integers leaves only mixed blocks in float, never the whole input
+    offset = np.float32(samples.mean(dtype=np.float64) / 32768.0) if frames else np.float32(0)
+
+    def read(start, stop):
+        block = to_mono(samples[start * channels:stop * channels], channels)
+        block -= offset
+        return block
+
+    if sample_rate == target_rate:
+        audio = np.empty(frames, np.float32)
+        for start in range(0, frames, RESAMPLE_BLOCK):
+            stop = min(start + RESAMPLE_BLOCK, frames)
+            audio[start:stop] = read(start, stop)
+    else:
+        audio = resample_blocks(read, frames, sample_rate, target_rate)
+    if target_dbfs is not None:
+        audio = normalize_loudness(audio, target_dbfs)
+    return to_int16(audio, in_place=True)
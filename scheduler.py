@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import threading
+import time
+
+# Virtual cost of a request with no known duration, in audio seconds
+MIN_COST = 1.0
+
+
+class TokenBucket:
+    """
+    Continuously refilling token bucket, not thread-safe on its own.
+
+    Args:
+        rate_per_minute (float): Tokens added per minute
+        capacity (float): Largest burst, defaults to one minute's worth
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount, now):
+        """Seconds until ``amount`` tokens are available."""
+        self._refill(now)
+        # Requests bigger than the bucket go through once it is full
+        needed = min(amount, self.capacity)
+        return max(needed - self.tokens, 0.0) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.tokens -= amount
+
+
+class RequestScheduler:
+    """
+    Process-wide gate in front of the transcription API quota.
+
+    Each request needs one token from the requests-per-minute bucket and its
+    audio length from the audio-seconds-per-minute bucket. Waiting requests
+    are ordered by weighted fair queuing on audio seconds: every session
+    gets an equal share of audio time, and short clips finish their virtual
+    turn sooner so they overtake long chunks without starving them.
+
+    Args:
+        requests_per_minute (float): Request quota, 0 for no limit
+        audio_seconds_per_minute (float): Audio quota, 0 for no limit
+    """
+
+    def __init__(self, requests_per_minute=0, audio_seconds_per_minute=0):
+        self._buckets = []
+        if requests_per_minute:
+            self._buckets.append((TokenBucket(requests_per_minute), lambda seconds: 1.0))
+        if audio_seconds_per_minute:
+            self._buckets.append((TokenBucket(audio_seconds_per_minute), lambda seconds: seconds))
+
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._clock = 0.0
+        self._last_tag = {}
+        self._granted = 0
+        self._waited = 0.0
+
+    def _delay(self, audio_seconds, now):
+        return max((bucket.time_until(cost(audio_seconds), now) for bucket, cost in self._buckets), default=0.0)
+
+    def acquire(self, audio_seconds=0.0, session=None):
+        """
+        Block until quota is available and it is this request's turn.
+
+        Args:
+            audio_seconds (float): Length of the audio being sent
+            session: Identifier of the session the request belongs to
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        started = time.monotonic()
+        with self._condition:
+            tag = max(self._clock, self._last_tag.get(session, 0.0)) + max(audio_seconds, MIN_COST)
+            self._last_tag[session] = tag
+            ticket = (tag, next(self._sequence), session, audio_seconds)
+            heapq.heappush(self._waiting, ticket)
+
+            while True:
+                if self._waiting[0] is ticket:
+                    delay = self._delay(audio_seconds, time.monotonic())
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                else:
+                    self._condition.wait()
+
+            heapq.heappop(self._waiting)
+            now = time.monotonic()
+            for bucket, cost in self._buckets:
+                bucket.consume(cost(audio_seconds), now)
+            self._clock = tag
+            if self._last_tag.get(session) == tag:
+                # No later requests from this session are waiting
+                del self._last_tag[session]
+            waited = now - started
+            self._granted += 1
+            self._waited += waited
+            self._condition.notify_all()
+        return waited
+
+    def queue_depth(self):
+        with self._condition:
+            return len(self._waiting)
+
+    def estimated_wait(self, session=None, audio_seconds=0.0):
+        """
+        Estimate the quota wait from the current buckets and queue.
+
+        Args:
+            session: With a session, the wait until its queued requests are
+                all sent; without, the wait for a new request
+            audio_seconds (float): Length of the new request, without a session
+
+        Returns:
+            float: Estimated seconds, ignoring API response time
+        """
+        with self._condition:
+            now = time.monotonic()
+            for bucket, _ in self._buckets:
+                bucket._refill(now)
+            levels = [bucket.tokens for bucket, _ in self._buckets]
+
+            queued = sorted(self._waiting)
+            if session is not None:
+                own = [index for index, ticket in enumerate(queued) if ticket[2] == session]
+                if not own:
+                    return 0.0
+                queued = queued[:own[-1] + 1]
+            else:
+                queued.append((None, None, None, audio_seconds))
+
+            elapsed = 0.0
+            for _, _, _, seconds in queued:
+                step = 0.0
+                for (bucket, cost), level in zip(self._buckets, levels):
+                    step = max(step, max(min(cost(seconds), bucket.capacity) - level, 0.0) / bucket.rate)
+                elapsed += step
+                levels = [
+                    min(bucket.capacity, level + step * bucket.rate) - cost(seconds)
+                    for (bucket, cost), level in zip(self._buckets, levels)
+                ]
+            return elapsed
+
+    def stats(self):
+        """
+        Snapshot of queue and wait counters.
+
+        Returns:
+            dict: Counter name to value
+        """
+        with self._condition:
+            return {
+                "queued": len(self._waiting),
+                "granted": self._granted,
+                "waited_seconds": self._waited
+            }
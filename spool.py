@@ -0,0 +1,74 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+
+COPY_BLOCK_SIZE = 1024 * 1024
+
+_spool_dirs = {}
+_spool_lock = threading.Lock()
+
+
+def spool_dir(root=None):
+    """
+    Directory holding this process's spooled audio, removed at exit.
+
+    Args:
+        root (str): Parent directory, the system temp directory if None
+
+    Returns:
+        str: The directory path
+    """
+    with _spool_lock:
+        path = _spool_dirs.get(root)
+        if path is None or not os.path.isdir(path):
+            path = _spool_dirs[root] = tempfile.mkdtemp(prefix="audioink-spool-", dir=root)
+            atexit.register(shutil.rmtree, path, True)
+        return path
+
+
+def spool_buffer(name, size_hint, threshold, root=None):
+    """
+    Writable buffer for audio, in memory when small and on disk otherwise.
+
+    Disk buffers are deleted as soon as they are closed or garbage collected,
+    so they live exactly as long as the job or session holding them. Their
+    ``name`` is the file path, which keeps the extension of ``name``.
+
+    Args:
+        name (str): File name the audio would have, for its extension
+        size_hint (int): Expected size in bytes
+        threshold (int): Sizes above this go to disk
+        root (str): Parent of the spool directory
+
+    Returns:
+        File-like object opened for reading and writing
+    """
+    if size_hint <= threshold:
+        buffer = BytesIO()
+        buffer.name = name
+        return buffer
+    return tempfile.NamedTemporaryFile(suffix=os.path.splitext(name)[1], dir=spool_dir(root))
+
+
+def spool_copy(audio_file, size, threshold, root=None):
+    """
+    Copy an upload into a buffer of its own, block by block.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        size (int): Size of the upload in bytes
+        threshold (int): Sizes above this go to disk
+        root (str): Parent of the spool directory
+
+    Returns:
+        File-like copy positioned at the start
+    """
+    buffer = spool_buffer(audio_file.name, size, threshold, root)
+    audio_file.seek(0)
+    shutil.copyfileobj(audio_file, buffer, COPY_BLOCK_SIZE)
+    audio_file.seek(0)
+    buffer.seek(0)
+    return buffer
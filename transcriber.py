@@ -0,0 +1,1220 @@
+"""
+AudioInk transcription engine.
+
+Conversion, chunking, Whisper API calls and text cleaning without any UI.
+pydub, requests, the search index and the fallback backends are imported
+on first use, so the cleaning-only path starts without them. Settings come
+from environment variables and can be overridden with configure().
+"""
+import itertools
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from autotune import MAX_CONCURRENCY, AdaptiveTuner
+from ffmpeg_stream import (
+    AudioInfo,
+    decode_pcm,
+    demuxer_name,
+    input_path,
+    probe_audio,
+    stream_transcode,
+    transcode_to_segments
+)
+from metrics import trace
+from scheduler import RequestScheduler
+from spool import spool_buffer, spool_copy
+from transcript import Transcript
+from transcription_cache import TranscriptionCache, hash_audio
+
+logger = logging.getLogger(__name__)
+
+# API Configuration
+AZURE_WHISPER_API_URL = os.environ.get("AZURE_WHISPER_API_URL", "https://your-api-endpoint.azure.com")
+API_KEY = os.environ.get("AZURE_API_KEY", "your_api_key_here")
+# Several deployments as a JSON list of {"url", "api_key", "weight"} objects,
+# replacing AZURE_WHISPER_API_URL when set. api_key defaults to API_KEY
+WHISPER_ENDPOINTS = json.loads(os.environ.get("WHISPER_ENDPOINTS", "[]"))
+SUPPORTED_FORMATS = ["mp3", "mp4", "mpeg", "mpga", "m4a", "wav", "webm"]
+MAX_FILE_SIZE = 25 * 1024 * 1024
+MAX_UPLOAD_SIZE = 200 * 1024 * 1024
+MAX_DURATION_SECONDS = 4 * 60 * 60
+
+# Chunking for audio over the API limit
+CHUNK_TARGET_SIZE = 20 * 1024 * 1024
+MAX_WORKERS = 4
+MIN_SILENCE_LEN = 700
+SILENCE_SEEK_STEP = 50
+
+# Transport encoding: "auto" sends the smallest of the original upload and a
+# 16 kHz mono re-encode, "stream" re-encodes through ffmpeg pipes without
+# buffering the audio, "wav" always sends uncompressed PCM
+UPLOAD_ENCODING = os.environ.get("UPLOAD_ENCODING", "auto")
+API_FORMATS = SUPPORTED_FORMATS + ["ogg", "flac"]
+COMPRESSED_FORMAT = "mp3"
+COMPRESSED_BITRATE = "32k"
+COMPRESSED_SAMPLE_RATE = 16000
+# A re-encode is only sent when its length is within this share (or a
+# second, whichever is more) of the probed duration, a short decode
+# would otherwise win on size
+DURATION_TOLERANCE = 0.02
+# 20 minutes at 32 kbps is about 4.7MB, well under the API limit
+SEGMENT_SECONDS = 20 * 60
+
+# Tune chunk length and requests in flight from observed API latency,
+# starting from SEGMENT_SECONDS and MAX_WORKERS. Decisions are logged to
+# TUNING_LOG_PATH: tuning.jsonl under CACHE_DIR if unset, nowhere if empty
+ADAPTIVE_TUNING = os.environ.get("ADAPTIVE_TUNING", "on").lower() in ("1", "true", "yes", "on")
+TUNING_LOG_PATH = os.environ.get("TUNING_LOG_PATH")
+# Voice-activity detection drops silence before upload. It needs decoded
+# PCM, so it doesn't apply to the "stream" encoding
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "").lower() in ("1", "true", "yes", "on")
+
+# Loudness WAV uploads and speech-only audio are normalized to, None keeps
+# the recording's own level
+TARGET_LOUDNESS_DBFS = -20.0
+
+# Transcription cache
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.expanduser("~/.cache/audioink"))
+CACHE_MEMORY_BYTES = 16 * 1024 * 1024
+CACHE_DISK_BYTES = 512 * 1024 * 1024
+
+# Full-text index of finished transcripts: transcripts.db under CACHE_DIR
+# if unset, off if set to an empty string
+SEARCH_INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH")
+
+# Uploads and intermediate audio above this size are kept in temp files
+# under SPOOL_DIR (the system temp directory if unset) instead of memory
+SPOOL_THRESHOLD = int(os.environ.get("SPOOL_THRESHOLD", 8 * 1024 * 1024))
+SPOOL_DIR = os.environ.get("SPOOL_DIR") or None
+
+# Backend transcribing by default, and the one used while it is failing or
+# slow ("" for none). "remote" is the Whisper API, "local" faster-whisper
+TRANSCRIPTION_BACKEND = os.environ.get("TRANSCRIPTION_BACKEND", "remote")
+FALLBACK_BACKEND = os.environ.get("FALLBACK_BACKEND", "local")
+# Local model preset, one of LOCAL_PRESETS, and where models are downloaded
+LOCAL_QUALITY = os.environ.get("LOCAL_QUALITY", "balanced")
+LOCAL_MODEL_DIR = os.environ.get("LOCAL_MODEL_DIR") or None
+# A request is slow when it takes longer than this many seconds plus this
+# many seconds per second of audio
+FALLBACK_SLOW_SECONDS = 10.0
+FALLBACK_SLOW_REALTIME = 0.5
+
+# HTTP client
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 60
+MAX_RETRIES = 4
+# Form fields asking for segment and word timestamps
+VERBOSE_FIELDS = {"response_format": "verbose_json", "timestamp_granularities[]": ["segment", "word"]}
+
+# API quota shared by every session in the process, 0 disables a limit
+REQUESTS_PER_MINUTE = float(os.environ.get("REQUESTS_PER_MINUTE", 0))
+AUDIO_SECONDS_PER_MINUTE = float(os.environ.get("AUDIO_SECONDS_PER_MINUTE", 0))
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def configure(api_url=None, api_key=None, upload_encoding=None, cache_dir=None, vad_enabled=None,
+              requests_per_minute=None, audio_seconds_per_minute=None, endpoints=None,
+              spool_threshold=None, spool_dir=None, search_index_path=None, backend=None,
+              fallback_backend=None, local_quality=None, local_model_dir=None, adaptive_tuning=None,
+              tuning_log_path=None):
+    """
+    Override settings read from the environment.
+
+    The shared HTTP client and cache are rebuilt only when a setting they
+    depend on actually changes, so this is cheap to call on every rerun.
+    """
+    global AZURE_WHISPER_API_URL, API_KEY, UPLOAD_ENCODING, CACHE_DIR, VAD_ENABLED
+    global REQUESTS_PER_MINUTE, AUDIO_SECONDS_PER_MINUTE, WHISPER_ENDPOINTS, SPOOL_THRESHOLD, SPOOL_DIR
+    global SEARCH_INDEX_PATH, TRANSCRIPTION_BACKEND, FALLBACK_BACKEND, LOCAL_QUALITY, LOCAL_MODEL_DIR
+    global ADAPTIVE_TUNING, TUNING_LOG_PATH
+    with _shared_lock:
+        if api_url is not None and api_url != AZURE_WHISPER_API_URL:
+            AZURE_WHISPER_API_URL = api_url
+            _shared.pop("client", None)
+        if api_key is not None and api_key != API_KEY:
+            API_KEY = api_key
+            _shared.pop("client", None)
+        if endpoints is not None and endpoints != WHISPER_ENDPOINTS:
+            WHISPER_ENDPOINTS = endpoints
+            _shared.pop("client", None)
+        if cache_dir is not None and cache_dir != CACHE_DIR:
+            CACHE_DIR = cache_dir
+            _shared.pop("cache", None)
+            _shared.pop("search_index", None)
+            _shared.pop("tuner", None)
+        if search_index_path is not None and search_index_path != SEARCH_INDEX_PATH:
+            SEARCH_INDEX_PATH = search_index_path
+            _shared.pop("search_index", None)
+        if requests_per_minute is not None and requests_per_minute != REQUESTS_PER_MINUTE:
+            REQUESTS_PER_MINUTE = requests_per_minute
+            _shared.pop("scheduler", None)
+        if audio_seconds_per_minute is not None and audio_seconds_per_minute != AUDIO_SECONDS_PER_MINUTE:
+            AUDIO_SECONDS_PER_MINUTE = audio_seconds_per_minute
+            _shared.pop("scheduler", None)
+        if adaptive_tuning is not None and adaptive_tuning != ADAPTIVE_TUNING:
+            ADAPTIVE_TUNING = adaptive_tuning
+            _shared.pop("tuner", None)
+        if tuning_log_path is not None and tuning_log_path != TUNING_LOG_PATH:
+            TUNING_LOG_PATH = tuning_log_path
+            _shared.pop("tuner", None)
+        if local_quality is not None and local_quality != LOCAL_QUALITY:
+            LOCAL_QUALITY = local_quality
+            _shared.pop("backend:local", None)
+        if local_model_dir is not None and (local_model_dir or None) != LOCAL_MODEL_DIR:
+            LOCAL_MODEL_DIR = local_model_dir or None
+            _shared.pop("backend:local", None)
+        if backend is not None:
+            TRANSCRIPTION_BACKEND = backend
+        if fallback_backend is not None:
+            FALLBACK_BACKEND = fallback_backend
+        if upload_encoding is not None:
+            UPLOAD_ENCODING = upload_encoding
+        if vad_enabled is not None:
+            VAD_ENABLED = vad_enabled
+        if spool_threshold is not None:
+            SPOOL_THRESHOLD = spool_threshold
+        if spool_dir is not None:
+            SPOOL_DIR = spool_dir or None
+
+
+def _get_shared(name, factory):
+    resource = _shared.get(name)
+    if resource is None:
+        with _shared_lock:
+            resource = _shared.get(name)
+            if resource is None:
+                resource = _shared[name] = factory()
+    return resource
+
+
+def get_transcription_cache():
+    return _get_shared(
+        "cache", lambda: TranscriptionCache(CACHE_DIR, CACHE_MEMORY_BYTES, CACHE_DISK_BYTES)
+    )
+
+
+def get_tuner():
+    """The shared AdaptiveTuner deciding chunk length and requests in flight."""
+    def build():
+        log_path = os.path.join(CACHE_DIR, "tuning.jsonl") if TUNING_LOG_PATH is None else TUNING_LOG_PATH
+        return AdaptiveTuner(SEGMENT_SECONDS, MAX_WORKERS, READ_TIMEOUT, log_path or None, ADAPTIVE_TUNING)
+
+    return _get_shared("tuner", build)
+
+
+def get_search_index():
+    """The shared TranscriptIndex, or None when indexing is off."""
+    if SEARCH_INDEX_PATH == "":
+        return None
+    from transcript_index import TranscriptIndex
+
+    path = SEARCH_INDEX_PATH or os.path.join(CACHE_DIR, "transcripts.db")
+    return _get_shared("search_index", lambda: TranscriptIndex(path))
+
+
+def index_transcript(audio_file, result, name=None, replace=True):
+    """
+    Add a finished transcription to the search index.
+
+    Errors are logged rather than raised, so a broken index never fails
+    the transcription itself.
+
+    Args:
+        audio_file: The transcribed file-like audio, keyed by its content
+        result: Cleaned text or Transcript
+        name (str): Name shown in search results, the file's own if None
+        replace (bool): Replace an earlier transcript of the same audio
+    """
+    index = get_search_index()
+    if index is None:
+        return
+    name = name or os.path.basename(audio_file.name)
+    try:
+        with trace("index"):
+            transcript = result if isinstance(result, Transcript) else Transcript(result)
+            index.add(hash_audio(audio_file, stage="index"), name, transcript, replace)
+    except Exception:
+        logger.exception("Couldn't index the transcript of %s", name)
+
+
+def api_endpoints():
+    return WHISPER_ENDPOINTS or [{"url": AZURE_WHISPER_API_URL}]
+
+
+def api_identity():
+    """Cache key component that changes when the set of endpoints does."""
+    return ",".join(sorted(endpoint["url"] for endpoint in api_endpoints()))
+
+
+def get_whisper_client():
+    def build():
+        from load_balancer import EndpointPool
+        from whisper_client import WhisperClient
+
+        endpoints = api_endpoints()
+        # With somewhere else to go, fail over instead of backing off
+        max_retries = MAX_RETRIES if len(endpoints) == 1 else 1
+        return EndpointPool([
+            (
+                WhisperClient(
+                    endpoint["url"],
+                    endpoint.get("api_key") or API_KEY,
+                    pool_size=MAX_CONCURRENCY * 2,
+                    max_retries=max_retries,
+                    connect_timeout=CONNECT_TIMEOUT,
+                    read_timeout=READ_TIMEOUT
+                ),
+                float(endpoint.get("weight", 1.0))
+            )
+            for endpoint in endpoints
+        ])
+
+    return _get_shared("client", build)
+
+
+def get_request_scheduler():
+    return _get_shared(
+        "scheduler", lambda: RequestScheduler(REQUESTS_PER_MINUTE, AUDIO_SECONDS_PER_MINUTE)
+    )
+
+
+class RemoteBackend:
+    """The Whisper API, through the shared client and request scheduler."""
+
+    @property
+    def identity(self):
+        return api_identity()
+
+    def transcribe(self, audio_file, session=None, timestamps=False):
+        duration = audio_seconds(audio_file)
+        size = file_size(audio_file)
+        get_request_scheduler().acquire(duration, session)
+
+        def send():
+            with trace("api_request", bytes_in=size, audio_seconds=duration) as span:
+                response = get_whisper_client().post_audio(
+                    audio_file, data=VERBOSE_FIELDS if timestamps else None, audio_seconds=duration
+                )
+                span.bytes_out = len(response.content)
+                if response.status_code != 200:
+                    span.outcome = "error"
+            return response
+
+        response = _tuned_request(duration, size, send)
+        if response.status_code != 200:
+            return False, f"API Error: {response.status_code} - {response.text}"
+        return True, _read_response(response, timestamps)
+
+
+def _tuned_request(duration, bytes_sent, send):
+    """
+    Send one API request in a tuner slot and report how it went.
+
+    Args:
+        duration (float): Seconds of audio in the request
+        bytes_sent (int): Size of the upload, None if unknown
+        send: Callable making the request and returning the response
+
+    Returns:
+        requests.Response: What ``send`` returned
+    """
+    import requests
+    from whisper_client import RETRY_STATUS_CODES
+
+    tuner = get_tuner()
+    with tuner.slot():
+        started = time.monotonic()
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            tuner.observe_failure(timed_out=isinstance(e, requests.ReadTimeout))
+            raise
+        finally:
+            _exchange.seconds = time.monotonic() - started
+    if response.status_code == 200:
+        upload_seconds = getattr(response, "upload_seconds", None)
+        # elapsed runs from the start of the upload to the response headers
+        server_seconds = response.elapsed.total_seconds() - (upload_seconds or 0.0)
+        tuner.observe(duration, bytes_sent, upload_seconds, server_seconds)
+    elif response.status_code in RETRY_STATUS_CODES:
+        tuner.observe_failure()
+    return response
+
+
+def _local_backend():
+    from backends import LOCAL_PRESETS, LocalWhisperBackend
+
+    model_size, beam_size = LOCAL_PRESETS.get(LOCAL_QUALITY, LOCAL_PRESETS["balanced"])
+    return LocalWhisperBackend(model_size, beam_size, download_root=LOCAL_MODEL_DIR)
+
+
+_backend_factories = {"remote": RemoteBackend, "local": _local_backend}
+
+
+def register_backend(name, factory):
+    """
+    Make a transcription backend available by name.
+
+    Args:
+        name (str): Name for TRANSCRIPTION_BACKEND and FALLBACK_BACKEND
+        factory: Callable returning the backend, called once per process
+    """
+    with _shared_lock:
+        _backend_factories[name] = factory
+        _shared.pop(f"backend:{name}", None)
+
+
+def get_backend(name=None):
+    """The shared backend registered under ``name``, TRANSCRIPTION_BACKEND if None."""
+    name = name or TRANSCRIPTION_BACKEND
+    if name not in _backend_factories:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return _get_shared(f"backend:{name}", _backend_factories[name])
+
+
+def get_fallback_backend():
+    """The backend used when the primary one fails, or None if there is none to use."""
+    if not FALLBACK_BACKEND or FALLBACK_BACKEND == TRANSCRIPTION_BACKEND:
+        return None
+    from backends import LocalWhisperBackend
+
+    if FALLBACK_BACKEND == "local" and not LocalWhisperBackend.available():
+        return None
+    return get_backend(FALLBACK_BACKEND)
+
+
+def get_fallback_policy():
+    from backends import FallbackPolicy
+
+    return _get_shared(
+        "fallback_policy", lambda: FallbackPolicy(FALLBACK_SLOW_SECONDS, FALLBACK_SLOW_REALTIME)
+    )
+
+
+# Seconds the last API exchange on this thread took once it had its tuner
+# slot, None if it made none. Waiting for quota or a slot is the app's own
+# doing, so it must not make the primary backend look slow.
+_exchange = threading.local()
+
+
+def _record_primary(policy, success, started, audio_file):
+    """Report a primary request to the fallback policy, warming the fallback at the first sign of trouble."""
+    exchange = getattr(_exchange, "seconds", None)
+    _exchange.seconds = None
+    elapsed = exchange if exchange is not None else time.monotonic() - started
+    if policy is not None and policy.record(success, elapsed, audio_seconds(audio_file)):
+        warm = getattr(get_fallback_backend(), "warm", None)
+        if warm is not None:
+            warm()
+
+
+def _with_fallback(audio_file, session, timestamps, primary, on_fallback=None):
+    """
+    Run a primary transcription, or the fallback backend instead while the
+    primary is unhealthy or after it fails.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        session: Identifier the request scheduler queues requests under
+        timestamps (bool): Ask for segment and word timestamps
+        primary: Callable taking the FallbackPolicy to report to, None
+            without a fallback, and returning (success, raw result)
+        on_fallback: Optional callable, called when the fallback backend
+            answered instead of the primary
+
+    Returns:
+        tuple: (success, raw text or Transcript, or error message)
+    """
+    fallback = get_fallback_backend()
+    if fallback is None:
+        return primary(None)
+    policy = get_fallback_policy()
+    if policy.allow_primary():
+        success, result = primary(policy)
+        if success:
+            return success, result
+        logger.warning("Transcription failed, retrying on %s: %s", fallback.identity, result)
+    success, result = _call_backend(fallback, audio_file, session, timestamps)
+    if success:
+        policy.note_fallback()
+        if on_fallback:
+            on_fallback()
+    return success, result
+
+
+def _call_backend(backend, audio_file, session, timestamps, policy=None):
+    """One backend request through the request cache, reported to ``policy`` if it isn't cached."""
+    cache = get_transcription_cache()
+    cache_params = {"response_format": "verbose_json"} if timestamps else {}
+    cache_key = hash_audio(audio_file, stage="request", url=backend.identity, **cache_params)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return True, Transcript.from_dict(json.loads(cached)) if timestamps else cached
+
+    started = time.monotonic()
+    _exchange.seconds = None
+    try:
+        success, result = backend.transcribe(audio_file, session=session, timestamps=timestamps)
+    except Exception as e:
+        success, result = False, f"Transcription error: {str(e)}"
+    _record_primary(policy, success, started, audio_file)
+    if success:
+        cache.put(cache_key, json.dumps(result.to_dict()) if timestamps else result)
+    return success, result
+
+
+def audio_segment():
+    """Import pydub on first use and point it at the ffmpeg binaries."""
+    from pydub import AudioSegment
+    from pydub.utils import which
+
+    if "pydub" not in _shared:
+        # Set FFmpeg paths automatically
+        AudioSegment.converter = which("ffmpeg")
+        AudioSegment.ffmpeg = which("ffmpeg")
+        AudioSegment.ffprobe = which("ffprobe")
+        _shared["pydub"] = True
+    return AudioSegment
+
+
+def get_audio_info(audio_file):
+    """
+    Probe an audio file's container headers, cached on its content hash.
+
+    Failed probes are cached too, so a corrupt file is only parsed once.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+
+    Returns:
+        AudioInfo: The probed facts
+
+    Raises:
+        RuntimeError: If the file can't be parsed or has no audio stream
+    """
+    cache = get_transcription_cache()
+    cache_key = hash_audio(audio_file, stage="probe")
+    cached = cache.get(cache_key)
+    if cached is not None:
+        data = json.loads(cached)
+        if "error" in data:
+            raise RuntimeError(data["error"])
+        return AudioInfo.from_dict(data)
+
+    try:
+        with trace("probe"):
+            info = probe_audio(audio_file)
+    except RuntimeError as e:
+        cache.put(cache_key, json.dumps({"error": str(e)}))
+        raise
+    cache.put(cache_key, json.dumps(info.to_dict()))
+    return info
+
+
+def audio_seconds(audio_file):
+    """Probed length of an audio file in seconds, 0 if it can't be read."""
+    try:
+        return get_audio_info(audio_file).duration or 0.0
+    except Exception:
+        return 0.0
+
+
+def decode_audio(audio_file):
+    """
+    Decode an audio file with pydub, reusing the cached probe.
+
+    Handing pydub the probed codec stops it from running its own ffprobe,
+    and handing it the path of a spooled file lets ffmpeg read it from disk
+    instead of pydub reading it into memory first. In-memory mp4 and m4a
+    uploads are spooled to disk, ffmpeg can't decode them from a pipe.
+    """
+    file_extension = audio_file.name.split(".")[-1].lower()
+    codec = None
+    if file_extension != "wav":
+        try:
+            codec = get_audio_info(audio_file).codec
+        except Exception:
+            # Let ffmpeg work it out
+            codec = None
+    with input_path(audio_file) as path:
+        audio = audio_segment().from_file(path or audio_file, format=demuxer_name(file_extension), codec=codec)
+    audio_file.seek(0)
+    return audio
+
+
+def decode_speech(audio_file, target_dbfs=TARGET_LOUDNESS_DBFS):
+    """
+    Decode audio to 16 kHz mono 16-bit samples.
+
+    ffmpeg only decodes, and 16-bit WAV is read directly. The downmix, DC
+    removal and resampling are vectorized NumPy operations run block by
+    block, so only the 16 kHz output is ever held as floats.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        target_dbfs (float): Loudness to normalize to, None to keep the level
+
+    Returns:
+        numpy.ndarray: The samples
+    """
+    import numpy as np
+    from pcm import preprocess
+
+    wav = _read_wav(audio_file) if audio_file.name.split(".")[-1].lower() == "wav" else None
+    if wav is not None:
+        pcm, sample_rate, channels = wav
+    else:
+        info = get_audio_info(audio_file)
+        sample_rate = info.sample_rate or COMPRESSED_SAMPLE_RATE
+        channels = info.channels or 1
+        pcm = decode_pcm(audio_file, sample_rate, channels)
+    samples = np.frombuffer(pcm, dtype="<i2")
+    return preprocess(samples, sample_rate, channels, COMPRESSED_SAMPLE_RATE, target_dbfs)
+
+
+def _read_wav(audio_file, frames=True):
+    """
+    Read a plain 16-bit WAV file without ffmpeg.
+
+    In-memory files are read without a copy where BytesIO allows it, as
+    a view of their value.
+
+    Returns:
+        tuple: (frames or None, sample rate, channels), or None if the wave
+        module can't read the file or it isn't 16-bit
+    """
+    import wave
+
+    try:
+        with wave.open(audio_file, "rb") as wav:
+            if wav.getsampwidth() != 2:
+                return None
+            data = None
+            if frames and isinstance(audio_file, BytesIO):
+                # wave leaves the file at the start of the sample data
+                start = audio_file.tell()
+                size = wav.getnframes() * wav.getnchannels() * 2
+                # getvalue() hands back the bytes the file was made from, getbuffer() would copy them
+                data = memoryview(audio_file.getvalue())[start:start + size]
+            elif frames:
+                data = wav.readframes(wav.getnframes())
+            return data, wav.getframerate(), wav.getnchannels()
+    except (wave.Error, EOFError):
+        return None
+    finally:
+        audio_file.seek(0)
+
+
+def write_wav(samples, name):
+    """Wrap 16 kHz mono 16-bit samples in a WAV buffer, spooled to disk when large."""
+    import wave
+
+    wav_io = spool_buffer(name, samples.nbytes + 44, SPOOL_THRESHOLD, SPOOL_DIR)
+    with wave.open(wav_io, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(COMPRESSED_SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    wav_io.seek(0)
+    return wav_io
+
+
+# Text cleaning pipeline, compiled once at import
+SYMBOLS_TO_REMOVE = "♪•¶§†‡©®™℠℗〈〉⟨⟩"
+SPEAKER_PATTERN = re.compile(r'\[\w+\s*\d*\]:')
+TIMESTAMP_PATTERN = re.compile(r'[\[\(]\d+:\d+[\]\)]')
+DISALLOWED_PATTERN = re.compile(r'[^\w\s.,?!\'"-]')
+# Runs of whitespace other than a lone space, so plain spaces aren't rewritten
+WHITESPACE_PATTERN = re.compile(r'\s{2,}|[^\S ]')
+# Every punctuation mark followed by another, which keeps the last of a run
+REPEATED_PUNCTUATION_PATTERN = re.compile(r'[.,?!](?=[.,?!])')
+SENTENCE_SPLIT_PATTERN = re.compile(r'([.!?]\s+)')
+# Same as \bi\b, but starting with a literal lets the engine skip ahead
+LONE_I_PATTERN = re.compile(r'i(?!\w)(?<!\wi)')
+COMMON_FIXES = {
+    "i m ": "I'm ",
+    "dont ": "don't ",
+    "cant ": "can't ",
+    "wont ": "won't ",
+    "im ": "I'm ",
+    "Id ": "I'd ",
+    "Ill ": "I'll ",
+    "lets ": "let's ",
+    "its ": "it's ",
+    # Add more as needed
+}
+# None of the fixes overlap or produce another fix's pattern, so a single
+# left-to-right scan gives the same result as replacing them one by one
+FIXES_PATTERN = re.compile("|".join(re.escape(original) for original in COMMON_FIXES))
+
+
+def _apply_fix(match):
+    return COMMON_FIXES[match.group()]
+
+
+def clean_transcription(text):
+    """
+    Clean up transcription text by removing unwanted symbols and fixing formatting.
+
+    Args:
+        text (str): The raw transcription text from the API
+
+    Returns:
+        str: Cleaned and formatted text
+    """
+    if not text:
+        return ""
+
+    with trace("clean", bytes_in=len(text.encode("utf-8"))) as span:
+        result = _clean_text(text)
+        span.bytes_out = len(result.encode("utf-8"))
+    return result
+
+
+def _clean_text(text):
+    # 1. Remove common transcription artifacts and symbols
+    # Common musical note symbols, bullets, etc.
+    for symbol in SYMBOLS_TO_REMOVE:
+        if symbol in text:
+            text = text.replace(symbol, '')
+
+    # 2. Remove speaker annotations like [Speaker 1]:
+    text = SPEAKER_PATTERN.sub('', text)
+
+    # 3. Remove timestamps like [00:15] or (00:15)
+    text = TIMESTAMP_PATTERN.sub('', text)
+
+    # 4. Keep only alphanumeric characters, spaces, and basic punctuation
+    text = DISALLOWED_PATTERN.sub('', text)
+
+    # 5. Replace multiple spaces with a single space
+    text = WHITESPACE_PATTERN.sub(' ', text)
+
+    # 6. Remove any repeated punctuation
+    text = REPEATED_PUNCTUATION_PATTERN.sub('', text)
+
+    # 7. Fix common transcription errors
+    text = FIXES_PATTERN.sub(_apply_fix, text)
+
+    # 8. Fix capitalization
+    # Capitalize first letter of sentences; odd entries are the separators
+    sentences = SENTENCE_SPLIT_PATTERN.split(text)
+    for i in range(0, len(sentences), 2):
+        if sentences[i]:
+            sentences[i] = sentences[i][0].upper() + sentences[i][1:]
+    result = "".join(sentences)
+
+    # Always capitalize 'I'
+    result = LONE_I_PATTERN.sub('I', result)
+
+    return result.strip()
+
+
+def _read_response(response, timestamps):
+    if timestamps:
+        return Transcript.from_response(response.json())
+    return response.json().get("text", "No text returned")
+
+
+def _clean_result(result):
+    if isinstance(result, Transcript):
+        return result.cleaned(clean_transcription)
+    return clean_transcription(result)
+
+
+def transcribe_audio(audio_file, clean=True, session=None, timestamps=False, on_fallback=None):
+    """
+    Transcribe one API-sized audio file.
+
+    Uses TRANSCRIPTION_BACKEND, or FALLBACK_BACKEND while that is failing
+    or too slow.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        clean (bool): Run clean_transcription over the result
+        session: Identifier the request scheduler queues the request under
+        timestamps (bool): Ask for segment and word timestamps
+        on_fallback: Optional callable, called if FALLBACK_BACKEND answered
+
+    Returns:
+        tuple: (success, text or Transcript with timestamps, or error message)
+    """
+    try:
+        success, raw_transcription = _with_fallback(
+            audio_file, session, timestamps,
+            lambda policy: _call_backend(get_backend(), audio_file, session, timestamps, policy),
+            on_fallback
+        )
+        if not success:
+            return False, raw_transcription
+
+        if not clean:
+            return True, raw_transcription
+
+        # Apply the cleaning function to remove unwanted symbols
+        return True, _clean_result(raw_transcription)
+    except Exception as e:
+        return False, f"Transcription error: {str(e)}"
+
+
+def spool_upload(audio_file):
+    """
+    Copy an upload for a background job, to disk if it is large.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+
+    Returns:
+        File-like copy that is deleted once it is no longer referenced
+    """
+    return spool_copy(audio_file, file_size(audio_file), SPOOL_THRESHOLD, SPOOL_DIR)
+
+
+def file_size(audio_file):
+    audio_file.seek(0, os.SEEK_END)
+    size = audio_file.tell()
+    audio_file.seek(0)
+    return size
+
+
+def chunk_seconds(audio_file):
+    """
+    Chunk length the tuner wants for this audio.
+
+    Returns:
+        float: Seconds per chunk, or None when the audio can go in one
+            request or tuning is off
+    """
+    tuner = get_tuner()
+    if not tuner.adaptive:
+        return None
+    duration = audio_seconds(audio_file)
+    segment_seconds = tuner.segment_for(duration)
+    return segment_seconds if duration > segment_seconds else None
+
+
+def split_audio(audio_file):
+    """
+    Cut audio at silence boundaries into pieces under the API size limit,
+    and no longer than the tuner's chunk length.
+
+    WAV input is split into WAV chunks, anything else into compressed chunks.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+
+    Returns:
+        list: File-like audio chunks in playback order
+    """
+    size = file_size(audio_file)
+    segment_seconds = chunk_seconds(audio_file)
+    if size <= MAX_FILE_SIZE and segment_seconds is None:
+        return [audio_file]
+
+    from pydub.silence import detect_silence
+
+    file_extension = audio_file.name.split(".")[-1].lower()
+    audio = decode_audio(audio_file)
+    chunk_format = "wav" if file_extension == "wav" else COMPRESSED_FORMAT
+    export_args = {} if chunk_format == "wav" else {"bitrate": COMPRESSED_BITRATE}
+    bytes_per_ms = size / max(len(audio), 1)
+    max_chunk_ms = max(int(CHUNK_TARGET_SIZE / bytes_per_ms), 1)
+    if segment_seconds is not None:
+        max_chunk_ms = min(max_chunk_ms, int(segment_seconds * 1000))
+
+    # Candidate cut points are the middles of silent stretches
+    silences = detect_silence(
+        audio,
+        min_silence_len=MIN_SILENCE_LEN,
+        silence_thresh=audio.dBFS - 16,
+        seek_step=SILENCE_SEEK_STEP
+    )
+    cut_points = [(start + end) // 2 for start, end in silences]
+
+    base_name = os.path.splitext(audio_file.name)[0]
+    chunks = []
+    start = 0
+    while start < len(audio):
+        limit = start + max_chunk_ms
+        if limit >= len(audio):
+            end = len(audio)
+        else:
+            # Prefer the last pause that still fits, fall back to a hard cut
+            end = max((p for p in cut_points if start < p <= limit), default=limit)
+        chunk_io = spool_buffer(
+            f"{base_name}_part{len(chunks) + 1:03d}.{chunk_format}",
+            int((end - start) * bytes_per_ms), SPOOL_THRESHOLD, SPOOL_DIR
+        )
+        audio[start:end].export(chunk_io, format=chunk_format, **export_args)
+        chunk_io.seek(0)
+        chunks.append(chunk_io)
+        start = end
+    return chunks
+
+
+def transcribe_chunks(chunks, session=None, timestamps=False, on_fallback=None):
+    """
+    Transcribe chunks concurrently and join the text back in order.
+
+    Args:
+        chunks (list): File-like audio chunks as returned by split_audio
+        session: Identifier the request scheduler queues the chunks under
+        timestamps (bool): Return a Transcript timed from the first chunk's start
+        on_fallback: Optional callable, called for each chunk FALLBACK_BACKEND answered
+
+    Returns:
+        tuple: (success, cleaned transcription or error message)
+    """
+    if len(chunks) == 1:
+        return transcribe_audio(chunks[0], session=session, timestamps=timestamps, on_fallback=on_fallback)
+
+    with ThreadPoolExecutor(max_workers=min(get_tuner().max_workers(), len(chunks))) as executor:
+        results = list(executor.map(
+            lambda chunk: transcribe_audio(
+                chunk, clean=False, session=session, timestamps=timestamps, on_fallback=on_fallback
+            ),
+            chunks
+        ))
+
+    for success, result in results:
+        if not success:
+            return False, result
+
+    if timestamps:
+        offsets = itertools.accumulate((audio_seconds(chunk) for chunk in chunks[:-1]), initial=0.0)
+        return True, Transcript.join([result for _, result in results], list(offsets)).cleaned(clean_transcription)
+
+    raw_transcription = " ".join(result.strip() for _, result in results)
+    return True, clean_transcription(raw_transcription)
+
+
+def transcribe_streaming(audio_file, session=None, timestamps=False, on_fallback=None):
+    """
+    Transcribe an upload without holding decoded audio in memory.
+
+    Uploads that fit the API limit are re-encoded straight into the request
+    body, larger ones into fixed-length chunk files on disk.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        session: Identifier the request scheduler queues the upload under
+        timestamps (bool): Return a Transcript instead of plain text
+        on_fallback: Optional callable, called for each request FALLBACK_BACKEND answered
+
+    Returns:
+        tuple: (success, cleaned transcription or error message)
+    """
+    encode_args = {
+        "output_format": COMPRESSED_FORMAT,
+        "sample_rate": COMPRESSED_SAMPLE_RATE,
+        "bitrate": COMPRESSED_BITRATE
+    }
+    try:
+        segment_seconds = chunk_seconds(audio_file)
+        if file_size(audio_file) <= MAX_FILE_SIZE and segment_seconds is None:
+            if TRANSCRIPTION_BACKEND != "remote":
+                # Only the API takes a streamed request body
+                return transcribe_audio(audio_file, session=session, timestamps=timestamps, on_fallback=on_fallback)
+
+            def stream(policy):
+                filename = f"{os.path.splitext(os.path.basename(audio_file.name))[0]}.{COMPRESSED_FORMAT}"
+                duration = audio_seconds(audio_file)
+                started = time.monotonic()
+                _exchange.seconds = None
+                get_request_scheduler().acquire(duration, session)
+
+                def send():
+                    with trace("api_request", audio_seconds=duration) as span:
+                        response = get_whisper_client().post_stream(
+                            filename, lambda: stream_transcode(audio_file, **encode_args),
+                            data=VERBOSE_FIELDS if timestamps else None, audio_seconds=duration
+                        )
+                        span.bytes_out = len(response.content)
+                        if response.status_code != 200:
+                            span.outcome = "error"
+                    return response
+
+                try:
+                    response = _tuned_request(duration, None, send)
+                    if response.status_code != 200:
+                        success, result = False, f"API Error: {response.status_code} - {response.text}"
+                    else:
+                        success, result = True, _read_response(response, timestamps)
+                except Exception as e:
+                    success, result = False, f"Transcription error: {str(e)}"
+                _record_primary(policy, success, started, audio_file)
+                return success, result
+
+            success, result = _with_fallback(audio_file, session, timestamps, stream, on_fallback)
+            return (True, _clean_result(result)) if success else (False, result)
+
+        with tempfile.TemporaryDirectory() as chunk_dir:
+            paths = transcode_to_segments(
+                audio_file, chunk_dir, segment_seconds or get_tuner().segment_seconds, **encode_args
+            )
+            chunks = [open(path, "rb") for path in paths]
+            try:
+                return transcribe_chunks(chunks, session, timestamps, on_fallback)
+            finally:
+                for chunk in chunks:
+                    chunk.close()
+    except Exception as e:
+        return False, f"Transcription error: {str(e)}"
+
+
+def validate_file(file):
+    if not file:
+        return False, "No file uploaded."
+    size = file.size if hasattr(file, "size") else file_size(file)
+    with trace("validate", bytes_in=size) as span:
+        span.outcome = "rejected"
+        if size > MAX_UPLOAD_SIZE:
+            return False, "File too large. Max size is 200MB."
+        if file.name.split(".")[-1].lower() not in SUPPORTED_FORMATS:
+            return False, "Unsupported file format."
+        try:
+            info = get_audio_info(file)
+        except Exception as e:
+            return False, f"Could not read audio: {str(e)}"
+        span.audio_seconds = info.duration
+        if info.duration is not None and info.duration > MAX_DURATION_SECONDS:
+            return False, "Recording too long. Max duration is 4 hours."
+        span.outcome = "ok"
+    return True, "File is valid."
+
+
+def convert_to_wav(audio_file):
+    """
+    Convert audio to a normalized 16 kHz mono 16-bit WAV.
+
+    WAV files already in that layout are passed through untouched.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+
+    Returns:
+        File-like WAV audio
+    """
+    file_extension = audio_file.name.split(".")[-1].lower()
+    if file_extension == "wav" and _read_wav(audio_file, frames=False) == (None, COMPRESSED_SAMPLE_RATE, 1):
+        return audio_file
+    with trace("convert_to_wav", bytes_in=file_size(audio_file)) as span:
+        samples = decode_speech(audio_file)
+        wav_io = write_wav(samples, f"{os.path.splitext(audio_file.name)[0]}.wav")
+        span.bytes_out = samples.nbytes + 44
+        span.audio_seconds = len(samples) / COMPRESSED_SAMPLE_RATE
+    return wav_io
+
+
+def _matches_duration(audio_file, seconds):
+    """Whether ``seconds`` is the probed length of the file, True if that can't be probed."""
+    try:
+        expected = get_audio_info(audio_file).duration
+    except Exception:
+        expected = None
+    if not expected:
+        return True
+    if abs(seconds - expected) <= max(1.0, DURATION_TOLERANCE * expected):
+        return True
+    logger.warning("Re-encode of %s is %.1fs long, expected %.1fs", audio_file.name, seconds, expected)
+    return False
+
+
+def encode_for_upload(audio_file):
+    """
+    Pick the smallest payload the API accepts for this audio.
+
+    The original upload is passed through when its format is accepted as-is,
+    and is compared against a low-bitrate 16 kHz mono re-encode. A re-encode
+    whose length doesn't match the probed duration is never chosen.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+
+    Returns:
+        File-like object to send to the API
+    """
+    file_extension = audio_file.name.split(".")[-1].lower()
+    original_size = file_size(audio_file)
+    with trace("encode_for_upload", bytes_in=original_size) as span:
+        audio = decode_audio(audio_file)
+        # What convert_to_wav would have sent
+        wav_size = int(len(audio) / 1000 * COMPRESSED_SAMPLE_RATE) * 2 + 44
+
+        compressed_io = BytesIO()
+        audio.set_frame_rate(COMPRESSED_SAMPLE_RATE).set_channels(1).export(
+            compressed_io, format=COMPRESSED_FORMAT, bitrate=COMPRESSED_BITRATE
+        )
+        compressed_io.seek(0)
+        compressed_io.name = f"{os.path.splitext(audio_file.name)[0]}.{COMPRESSED_FORMAT}"
+
+        candidates = []
+        if _matches_duration(audio_file, len(audio) / 1000):
+            candidates.append((compressed_io.getbuffer().nbytes, compressed_io))
+        if file_extension in API_FORMATS:
+            candidates.append((original_size, audio_file))
+        if not candidates:
+            raise ValueError(f"Decoded {len(audio) / 1000:.1f}s of audio, not the whole recording")
+        payload_size, payload = min(candidates, key=lambda candidate: candidate[0])
+        span.bytes_out = payload_size
+        span.audio_seconds = len(audio) / 1000
+
+    logger.info(
+        "Upload encoding for %s: sending %s (%d bytes), saved %d bytes versus WAV",
+        audio_file.name, payload.name, payload_size, wav_size - payload_size
+    )
+    return payload
+
+
+def encode_speech_only(audio_file):
+    """
+    Drop non-speech audio with voice-activity detection and encode the rest.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+
+    Returns:
+        File-like object to send to the API. Its ``timestamp_map`` attribute
+        maps times in the upload back to the original recording.
+    """
+    from pcm import normalize_loudness, to_float, to_int16
+    from vad import strip_silence
+
+    # Detect on the recording's own level, the thresholds are absolute
+    samples = decode_speech(audio_file, target_dbfs=None)
+    speech, timestamp_map = strip_silence(samples, COMPRESSED_SAMPLE_RATE)
+    if TARGET_LOUDNESS_DBFS is not None:
+        speech = to_int16(normalize_loudness(to_float(speech), TARGET_LOUDNESS_DBFS))
+
+    base_name = os.path.splitext(audio_file.name)[0]
+    if UPLOAD_ENCODING == "wav":
+        payload = write_wav(speech, f"{base_name}.wav")
+    else:
+        speech_audio = audio_segment()(
+            speech.tobytes(), frame_rate=COMPRESSED_SAMPLE_RATE, sample_width=2, channels=1
+        )
+        payload = spool_buffer(f"{base_name}.{COMPRESSED_FORMAT}", 0, SPOOL_THRESHOLD, SPOOL_DIR)
+        speech_audio.export(payload, format=COMPRESSED_FORMAT, bitrate=COMPRESSED_BITRATE)
+        payload.seek(0)
+    payload.timestamp_map = timestamp_map
+
+    logger.info(
+        "Voice activity for %s: kept %.1fs of %.1fs",
+        audio_file.name, len(speech) / COMPRESSED_SAMPLE_RATE, len(samples) / COMPRESSED_SAMPLE_RATE
+    )
+    return payload
+
+
+def prepare_upload(audio_file):
+    if VAD_ENABLED:
+        return encode_speech_only(audio_file)
+    if UPLOAD_ENCODING == "wav":
+        return convert_to_wav(audio_file)
+    return encode_for_upload(audio_file)
+
+
+def prepare_chunks(audio_file, on_stage=None):
+    """
+    Convert audio for upload and split it into API-sized chunks.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        on_stage: Optional callable receiving a short message per stage
+
+    Returns:
+        tuple: (success, (chunks, TimestampMap or None) or error message)
+    """
+    def stage(message):
+        if on_stage:
+            on_stage(message)
+
+    stage("Converting audio...")
+    try:
+        processed_file = prepare_upload(audio_file)
+    except Exception as e:
+        return False, f"Error converting audio: {str(e)}"
+
+    # Split long recordings into API-sized chunks
+    stage("Splitting audio...")
+    try:
+        chunks = split_audio(processed_file)
+    except Exception as e:
+        return False, f"Error converting audio: {str(e)}"
+    return True, (chunks, getattr(processed_file, "timestamp_map", None))
+
+
+def transcribe_file(audio_file, on_stage=None, session=None, timestamps=False, prepared=None, name=None):
+    """
+    Run the whole conversion, chunking and transcription pipeline.
+
+    Repeat requests for the same audio and settings are served from the
+    transcription cache without converting anything. Finished transcripts
+    are added to the search index.
+
+    Args:
+        audio_file: A file-like audio object with a ``name`` attribute
+        on_stage: Optional callable receiving a short message per stage
+        session: Identifier the request scheduler queues API calls under
+        timestamps (bool): Return a Transcript timed against the original audio
+        prepared: Optional callable returning prepare_chunks' result for this
+            audio, e.g. from a prefetch, used instead of converting again
+        name (str): Name the transcript is searchable under, the file's own if None
+
+    Returns:
+        tuple: (success, cleaned transcription or error message)
+    """
+    def stage(message):
+        if on_stage:
+            on_stage(message)
+
+    cache = get_transcription_cache()
+    cache_params = {"timestamps": True} if timestamps else {}
+    cache_key = hash_audio(
+        audio_file, stage="pipeline", url=get_backend().identity, encoding=UPLOAD_ENCODING,
+        vad=VAD_ENABLED, **cache_params
+    )
+    cached_result = cache.get(cache_key)
+    if cached_result is not None:
+        result = Transcript.from_dict(json.loads(cached_result)) if timestamps else cached_result
+        # Only if indexing was off when it was first transcribed
+        index_transcript(audio_file, result, name, replace=False)
+        return True, result
+
+    # Set when any of this recording's requests needed the fallback
+    fell_back = threading.Event()
+    if UPLOAD_ENCODING == "stream":
+        # Convert and upload in one pass through ffmpeg pipes
+        stage("Transcribing your audio...")
+        success, result = transcribe_streaming(audio_file, session, timestamps, fell_back.set)
+    else:
+        if prepared is not None:
+            stage("Converting audio...")
+            success, result = prepared()
+        else:
+            success, result = prepare_chunks(audio_file, on_stage)
+        if not success:
+            return False, result
+        chunks, timestamp_map = result
+
+        stage("Transcribing your audio...")
+        success, result = transcribe_chunks(chunks, session, timestamps, fell_back.set)
+        if success and timestamps and timestamp_map is not None:
+            # Times from speech-only audio back onto the recording
+            result = result.map_times(timestamp_map.to_original)
+
+    if success:
+        # Results that needed the fallback are cached per request, but the
+        # whole recording is worth another try on the primary backend
+        if not fell_back.is_set():
+            cache.put(cache_key, json.dumps(result.to_dict()) if timestamps else result)
+        index_transcript(audio_file, result, name)
+    return success, result
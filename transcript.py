@@ -0,0 +1,153 @@
+import json
+
+
+class Word:
+    __slots__ = ("start", "end", "text")
+
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+
+class Segment:
+    __slots__ = ("start", "end", "text")
+
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+
+def _timestamp(seconds, separator):
+    milliseconds = int(round(max(seconds, 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+class Transcript:
+    """
+    Transcription text with segment and word timestamps in seconds.
+
+    Segments are cleaned one by one so every segment keeps its own times;
+    ``text`` is the whole transcript cleaned in one go, matching the plain
+    text output. Words keep the API's raw text.
+
+    Args:
+        text (str): The full transcript
+        segments (list): Segment objects in order
+        words (list): Word objects in order
+    """
+
+    __slots__ = ("text", "segments", "words")
+
+    def __init__(self, text, segments=(), words=()):
+        self.text = text
+        self.segments = list(segments)
+        self.words = list(words)
+
+    @classmethod
+    def from_response(cls, data):
+        """
+        Build a transcript from a ``verbose_json`` API response.
+
+        Args:
+            data (dict): The decoded response
+
+        Returns:
+            Transcript: Uncleaned transcript
+        """
+        text = data.get("text", "No text returned").strip()
+        segments = [
+            Segment(float(segment["start"]), float(segment["end"]), segment["text"].strip())
+            for segment in data.get("segments") or []
+        ]
+        if not segments and text:
+            segments = [Segment(0.0, float(data.get("duration") or 0.0), text)]
+        words = [
+            Word(float(word["start"]), float(word["end"]), word["word"].strip())
+            for word in data.get("words") or []
+        ]
+        return cls(text, segments, words)
+
+    @classmethod
+    def join(cls, parts, offsets):
+        """
+        Concatenate chunk transcripts, shifting each by its chunk's start.
+
+        Args:
+            parts (list): Transcript per chunk, in order
+            offsets (list): Start of each chunk in seconds
+
+        Returns:
+            Transcript: The combined, uncleaned transcript
+        """
+        joined = cls(" ".join(part.text for part in parts))
+        for part, offset in zip(parts, offsets):
+            shifted = part.map_times(lambda t: t + offset)
+            joined.segments.extend(shifted.segments)
+            joined.words.extend(shifted.words)
+        return joined
+
+    def map_times(self, convert):
+        """
+        Copy with every time passed through ``convert``.
+
+        Args:
+            convert: Callable taking and returning seconds, e.g.
+                ``TimestampMap.to_original``
+
+        Returns:
+            Transcript: The remapped copy
+        """
+        return Transcript(
+            self.text,
+            [Segment(convert(s.start), convert(s.end), s.text) for s in self.segments],
+            [Word(convert(w.start), convert(w.end), w.text) for w in self.words]
+        )
+
+    def cleaned(self, clean):
+        """
+        Copy with the text and each segment passed through ``clean``.
+
+        Args:
+            clean: Text cleaning callable, e.g. clean_transcription
+
+        Returns:
+            Transcript: The cleaned copy, with segments cleaning to nothing dropped
+        """
+        segments = [Segment(s.start, s.end, clean(s.text)) for s in self.segments]
+        return Transcript(clean(self.text), [s for s in segments if s.text], self.words)
+
+    def to_dict(self):
+        return {
+            "text": self.text,
+            "segments": [{"start": s.start, "end": s.end, "text": s.text} for s in self.segments],
+            "words": [{"start": w.start, "end": w.end, "word": w.text} for w in self.words]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["text"],
+            [Segment(s["start"], s["end"], s["text"]) for s in data["segments"]],
+            [Word(w["start"], w["end"], w["word"]) for w in data["words"]]
+        )
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def to_srt(self):
+        return "\n".join(
+            f"{index}\n{_timestamp(s.start, ',')} --> {_timestamp(s.end, ',')}\n{s.text}\n"
+            for index, s in enumerate(self.segments, 1)
+        )
+
+    def to_vtt(self):
+        cues = "\n".join(
+            f"{_timestamp(s.start, '.')} --> {_timestamp(s.end, '.')}\n{s.text}\n"
+            for s in self.segments
+        )
+        return f"WEBVTT\n\n{cues}"
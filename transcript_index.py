@@ -0,0 +1,285 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Transcripts without timestamps are indexed in passages of this many words
+PASSAGE_WORDS = 60
+# Words of context either side of a match in result snippets
+SNIPPET_TOKENS = 16
+SNIPPET_MARKS = ("**", "**")
+# Ranking costs a few microseconds per matching passage, so queries matching
+# more than this many rank only the newest ones, the likeliest to be wanted
+MAX_RANKED = 20000
+# Dropped from queries that have other words, they match nearly everything
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have he i if in is it its of on or she so that the "
+    "their them they this to was we were what when which who will with you".split()
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    created REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS passages (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL,
+    start REAL,
+    end REAL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS passages_document ON passages (document_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts USING fts5(
+    text, content='passages', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2'
+);
+"""
+
+# Quoted phrases, or single words with an optional trailing * for prefixes
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\w+)(\*?)')
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 query that matches every term.
+
+    Everything but words, quoted phrases and trailing ``*`` is dropped, so
+    user input can't produce FTS5 syntax errors. Stopwords are dropped too
+    unless the query is nothing but stopwords.
+
+    Args:
+        query (str): What the user typed
+
+    Returns:
+        str: The FTS5 MATCH expression, empty if there is nothing to search
+    """
+    parts = []
+    stopwords = []
+    for phrase, word, prefix in QUERY_PATTERN.findall(query):
+        if phrase:
+            words = WORD_PATTERN.findall(phrase)
+            if words:
+                parts.append('"' + " ".join(words) + '"')
+        elif word:
+            (stopwords if not prefix and word.lower() in STOPWORDS else parts).append(f'"{word}"{prefix}')
+    return " ".join(parts or stopwords)
+
+
+def passages(transcript):
+    """
+    Split a transcript into indexed passages.
+
+    Args:
+        transcript: A Transcript
+
+    Returns:
+        list: (start, end, text) triples, times None without timestamps
+    """
+    if transcript.segments:
+        return [(segment.start, segment.end, segment.text) for segment in transcript.segments if segment.text]
+    words = transcript.text.split()
+    return [
+        (None, None, " ".join(words[index:index + PASSAGE_WORDS]))
+        for index in range(0, len(words), PASSAGE_WORDS)
+    ]
+
+
+class SearchHit:
+    """
+    One passage matching a search.
+
+    Args:
+        key (str): Key of the transcript the passage belongs to
+        name (str): Name the transcript was indexed under
+        created (float): When the transcript was indexed, as a Unix time
+        start (float): Passage start in seconds, None without timestamps
+        end (float): Passage end in seconds, None without timestamps
+        snippet (str): Passage text around the match, matches marked up
+        score (float): BM25 relevance, lower is better
+    """
+
+    __slots__ = ("key", "name", "created", "start", "end", "snippet", "score")
+
+    def __init__(self, key, name, created, start, end, snippet, score):
+        self.key = key
+        self.name = name
+        self.created = created
+        self.start = start
+        self.end = end
+        self.snippet = snippet
+        self.score = score
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class TranscriptIndex:
+    """
+    Persistent full-text index of finished transcripts.
+
+    Transcripts are stored in SQLite and split into passages, the API's
+    segments when there are timestamps, which an FTS5 table indexes with
+    Porter stemming. Searches rank passages by BM25, so every hit comes
+    with the time it was said. Adding a transcript is one small
+    transaction, so the index grows as transcriptions finish.
+
+    Args:
+        path (str): Database file, created if missing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One connection shared by the app's threads, serialized by the lock
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SCHEMA)
+
+    def _has(self, key):
+        return self._connection.execute("SELECT 1 FROM documents WHERE key = ?", (key,)).fetchone() is not None
+
+    def _delete(self, key):
+        row = self._connection.execute("SELECT id FROM documents WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False
+        # External-content FTS rows are removed by replaying their text
+        self._connection.execute(
+            "INSERT INTO passages_fts (passages_fts, rowid, text) "
+            "SELECT 'delete', id, text FROM passages WHERE document_id = ?", row
+        )
+        self._connection.execute("DELETE FROM passages WHERE document_id = ?", row)
+        self._connection.execute("DELETE FROM documents WHERE id = ?", row)
+        return True
+
+    def add(self, key, name, transcript, replace=True):
+        """
+        Index a transcript.
+
+        Args:
+            key (str): Identifier of the recording, e.g. its content hash
+            name (str): Name shown in search results
+            transcript: A Transcript
+            replace (bool): Replace an earlier transcript under the same key,
+                rather than keeping it
+
+        Returns:
+            bool: Whether the transcript was added
+        """
+        rows = passages(transcript)
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                if replace:
+                    self._delete(key)
+                elif self._has(key):
+                    self._connection.execute("COMMIT")
+                    return False
+                document_id = self._connection.execute(
+                    "INSERT INTO documents (key, name, created, text) VALUES (?, ?, ?, ?)",
+                    (key, name, time.time(), transcript.text)
+                ).lastrowid
+                self._connection.executemany(
+                    "INSERT INTO passages (document_id, start, end, text) VALUES (?, ?, ?, ?)",
+                    [(document_id, start, end, text) for start, end, text in rows]
+                )
+                self._connection.execute(
+                    "INSERT INTO passages_fts (rowid, text) SELECT id, text FROM passages WHERE document_id = ?",
+                    (document_id,)
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return True
+
+    def remove(self, key):
+        """
+        Drop a transcript from the index.
+
+        Returns:
+            bool: Whether there was one
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                removed = self._delete(key)
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return removed
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._has(key)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def get(self, key):
+        """
+        Full text of an indexed transcript.
+
+        Returns:
+            str: The text, or None if the key isn't indexed
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT text FROM documents WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def search(self, query, limit=20):
+        """
+        Find the passages best matching a query.
+
+        Every word must appear in a passage for it to match; quoted phrases
+        must appear as written and ``word*`` matches any word starting so.
+        Only the newest MAX_RANKED matches are ranked.
+
+        Args:
+            query (str): Free-text query
+            limit (int): Most hits returned
+
+        Returns:
+            list: SearchHit objects, best first
+        """
+        expression = match_expression(query)
+        if not expression:
+            return []
+        with self._lock:
+            # Walking matches newest first needs no scoring, so this is cheap
+            oldest = self._connection.execute(
+                "SELECT rowid FROM passages_fts WHERE passages_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                (expression, MAX_RANKED - 1)
+            ).fetchone()
+            rows = self._connection.execute(
+                "SELECT documents.key, documents.name, documents.created, passages.start, passages.end, "
+                "       hits.snippet, hits.rank "
+                "FROM (SELECT rowid, rank, snippet(passages_fts, 0, ?, ?, '…', ?) AS snippet "
+                "      FROM passages_fts WHERE passages_fts MATCH ? AND rowid >= ? "
+                "      ORDER BY rank LIMIT ?) AS hits "
+                "JOIN passages ON passages.id = hits.rowid "
+                "JOIN documents ON documents.id = passages.document_id "
+                "ORDER BY hits.rank",
+                (*SNIPPET_MARKS, SNIPPET_TOKENS, expression, oldest[0] if oldest else 0, limit)
+            ).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+    def optimize(self):
+        """Merge the full-text index into one b-tree, which speeds up searches after bulk loads."""
+        with self._lock:
+            self._connection.execute("INSERT INTO passages_fts (passages_fts) VALUES ('optimize')")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
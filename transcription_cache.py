@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+HASH_BLOCK_SIZE = 1024 * 1024
+# Disk eviction frees down to this share of the budget, so the directory
+# is scanned once per batch of evictions rather than on every put
+EVICT_TARGET = 0.9
+
+
+def hash_audio(audio_file, **params):
+    """
+    Build a content-addressed cache key for an audio file.
+
+    Args:
+        audio_file: A seekable file-like object holding the audio bytes
+        **params: Request parameters that change the transcription result
+
+    Returns:
+        str: Hex SHA-256 digest of the audio bytes and the parameters
+    """
+    digest = hashlib.sha256()
+    audio_file.seek(0)
+    while True:
+        block = audio_file.read(HASH_BLOCK_SIZE)
+        if not block:
+            break
+        digest.update(block)
+    audio_file.seek(0)
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Two-tier (memory and disk) transcript cache with size-based LRU eviction.
+
+    The disk tier's size is kept as a running total, counted once on the
+    first write, and the directory is only scanned when it goes over budget.
+
+    Args:
+        cache_dir (str): Directory for the on-disk tier
+        max_memory_bytes (int): Size budget for the in-memory tier
+        max_disk_bytes (int): Size budget for the on-disk tier
+    """
+
+    def __init__(self, cache_dir, max_memory_bytes, max_disk_bytes):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def get(self, key):
+        path = self._path(key)
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+        if text is not None:
+            # Keep the disk copy of a hot entry from looking stale
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return text
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            # Touch the file so disk eviction sees it as recently used
+            os.utime(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            self._remember(key, text)
+        return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._remember(key, text)
+
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            size = os.path.getsize(tmp_path)
+            try:
+                size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            over = self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _remember(self, key, text):
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key).encode("utf-8"))
+        self._memory[key] = text
+        self._memory_bytes += len(text.encode("utf-8"))
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.encode("utf-8"))
+
+    def _evict_disk(self):
+        with self._evict_lock:
+            total = self._scan_and_evict()
+        with self._lock:
+            self._disk_bytes = total
+
+    def _scan_and_evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".txt"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.max_disk_bytes:
+            return total
+        # Oldest first
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes * EVICT_TARGET:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        return total
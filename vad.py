@@ -0,0 +1,133 @@
+import numpy as np
+
+FRAME_MS = 30
+MIN_SPEECH_MS = 200
+MIN_SILENCE_MS = 600
+PADDING_MS = 200
+# Below this the whole recording is treated as silence
+SILENCE_FLOOR_DB = -60.0
+# Quieter recordings than this spread are treated as all speech
+MIN_DYNAMIC_RANGE_DB = 10.0
+
+
+class TimestampMap:
+    """
+    Maps times in speech-only audio back to times in the original recording.
+
+    Args:
+        output_starts (numpy.ndarray): Start of each kept region in the
+            speech-only audio, in seconds
+        original_starts (numpy.ndarray): Start of the same regions in the
+            original audio, in seconds
+    """
+
+    __slots__ = ("output_starts", "original_starts")
+
+    def __init__(self, output_starts, original_starts):
+        self.output_starts = np.asarray(output_starts, dtype=np.float64)
+        self.original_starts = np.asarray(original_starts, dtype=np.float64)
+
+    def to_original(self, times):
+        """
+        Convert speech-only times to original times.
+
+        Args:
+            times (float or array-like): Times in seconds
+
+        Returns:
+            float or numpy.ndarray: The matching original times
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if not len(self.output_starts):
+            return times
+        index = np.searchsorted(self.output_starts, times, side="right") - 1
+        index = np.clip(index, 0, len(self.output_starts) - 1)
+        mapped = self.original_starts[index] + (times - self.output_starts[index])
+        return mapped if mapped.ndim else float(mapped)
+
+
+def _runs(mask):
+    """Start and end indices of every run of True values."""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def detect_speech(samples, sample_rate, full_scale=32768.0, frame_ms=FRAME_MS,
+                  min_speech_ms=MIN_SPEECH_MS, min_silence_ms=MIN_SILENCE_MS, padding_ms=PADDING_MS):
+    """
+    Find speech regions with an adaptive frame-energy threshold.
+
+    The threshold sits between the recording's noise floor and its loud
+    frames, so it follows the input level instead of a fixed dBFS value.
+
+    Args:
+        samples (numpy.ndarray): Mono PCM samples
+        sample_rate (int): Samples per second
+        full_scale (float): Sample value of 0 dBFS
+        frame_ms (int): Analysis frame length
+        min_speech_ms (int): Shorter bursts are treated as noise
+        min_silence_ms (int): Shorter pauses are kept
+        padding_ms (int): Audio kept either side of each region
+
+    Returns:
+        list: (start_sample, end_sample) pairs in order
+    """
+    frame_length = max(int(sample_rate * frame_ms / 1000), 1)
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    frames = frames.astype(np.float32) / full_scale
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    level_db = 20 * np.log10(rms + 1e-10)
+
+    noise_db, loud_db = np.percentile(level_db, [10, 95])
+    if loud_db < SILENCE_FLOOR_DB:
+        return []
+    if loud_db - noise_db < MIN_DYNAMIC_RANGE_DB:
+        return [(0, len(samples))]
+    threshold_db = noise_db + 0.35 * (loud_db - noise_db)
+
+    starts, ends = _runs(level_db > threshold_db)
+    keep = (ends - starts) * frame_ms >= min_speech_ms
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return []
+
+    # Pad, then merge regions separated by short pauses
+    pad = int(np.ceil(padding_ms / frame_ms))
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, frame_count)
+    split = (starts[1:] - ends[:-1]) * frame_ms >= min_silence_ms
+    starts = starts[np.concatenate(([True], split))]
+    ends = ends[np.concatenate((split, [True]))]
+
+    ends = ends * frame_length
+    # The last frame also covers the remainder that didn't fill a frame
+    ends[ends == frame_count * frame_length] = len(samples)
+    return list(zip((starts * frame_length).tolist(), ends.tolist()))
+
+
+def strip_silence(samples, sample_rate, **kwargs):
+    """
+    Remove non-speech regions from PCM audio.
+
+    Args:
+        samples (numpy.ndarray): Mono PCM samples
+        sample_rate (int): Samples per second
+        **kwargs: Passed to detect_speech
+
+    Returns:
+        tuple: (speech-only samples, TimestampMap back to the original)
+    """
+    regions = detect_speech(samples, sample_rate, **kwargs)
+    if not regions:
+        # Nothing recognisable as speech, so send everything rather than nothing
+        regions = [(0, len(samples))]
+
+    starts = np.array([start for start, _ in regions], dtype=np.int64)
+    lengths = np.array([end - start for start, end in regions], dtype=np.int64)
+    output_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    speech = np.concatenate([samples[start:end] for start, end in regions])
+    return speech, TimestampMap(output_starts / sample_rate, starts / sample_rate)
@@ -0,0 +1,274 @@
+import mimetypes
+import os
+import random
+import threading
+import time
+import uuid
+from email.utils import parsedate_to_datetime
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header given either as seconds or as an HTTP date.
+
+    Args:
+        value (str): The raw header value
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def _multipart_head(boundary, filename, mime_type, fields):
+    parts = []
+    for name, values in (fields or {}).items():
+        for value in values if isinstance(values, (list, tuple)) else [values]:
+            parts.append(
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+    parts.append(
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {mime_type}\r\n\r\n"
+    )
+    return "".join(parts).encode("utf-8")
+
+
+def _multipart_tail(boundary):
+    return f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+
+def iter_multipart(boundary, filename, mime_type, blocks, fields=None):
+    """
+    Wrap audio blocks in a single-file multipart/form-data body.
+
+    Args:
+        boundary (str): Multipart boundary
+        filename (str): File name reported to the API
+        mime_type (str): Content type of the file part
+        blocks: Iterable of audio byte blocks
+        fields (dict): Form fields sent before the file, list values repeated
+
+    Yields:
+        bytes: Body blocks in order
+    """
+    yield _multipart_head(boundary, filename, mime_type, fields)
+    yield from blocks
+    yield _multipart_tail(boundary)
+
+
+class MultipartBody:
+    """
+    Read-only file-like multipart body that reads the audio from its source.
+
+    requests sends it block by block with a Content-Length, so uploads
+    spooled to disk never have to be read into memory.
+
+    Args:
+        boundary (str): Multipart boundary
+        filename (str): File name reported to the API
+        mime_type (str): Content type of the file part
+        audio_file: Seekable file-like audio, read from its current position
+        fields (dict): Form fields sent before the file, list values repeated
+    """
+
+    def __init__(self, boundary, filename, mime_type, audio_file, fields=None):
+        head = _multipart_head(boundary, filename, mime_type, fields)
+        tail = _multipart_tail(boundary)
+        start = audio_file.tell()
+        audio_size = audio_file.seek(0, os.SEEK_END) - start
+        audio_file.seek(start)
+        self._parts = [BytesIO(head), audio_file, BytesIO(tail)]
+        self._length = len(head) + audio_size + len(tail)
+        # When the last byte was read, i.e. the upload finished
+        self.sent_at = None
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return b"".join(part.read() for part in self._parts)
+        while self._parts:
+            block = self._parts[0].read(size)
+            if block:
+                return block
+            self._parts.pop(0)
+        if self.sent_at is None:
+            self.sent_at = time.monotonic()
+        return b""
+
+
+class WhisperClient:
+    """
+    Connection-pooled client for the Whisper transcription endpoint.
+
+    Connections are kept alive across requests, and 429/5xx responses or
+    connection failures are retried with jittered exponential backoff that
+    honors Retry-After. Responses carry ``upload_seconds``, how long the
+    final attempt took to send its body, None if unknown.
+
+    Args:
+        url (str): Transcription endpoint URL
+        api_key (str): API key sent as both ``api-key`` and bearer token
+        pool_size (int): Maximum number of pooled connections per host
+        max_retries (int): Retries after the first attempt
+        backoff_base (float): Backoff for the first retry, in seconds
+        backoff_max (float): Upper bound for a single backoff, in seconds
+        connect_timeout (float): TCP/TLS connect timeout, in seconds
+        read_timeout (float): Timeout waiting for the response, in seconds
+    """
+
+    def __init__(self, url, api_key, pool_size=10, max_retries=4, backoff_base=0.5,
+                 backoff_max=30.0, connect_timeout=5.0, read_timeout=60.0):
+        self.url = url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "api-key": api_key,
+            "Authorization": f"Bearer {api_key}"
+        })
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+        self._failures = 0
+
+    def _backoff(self, attempt, retry_after=None):
+        # Full jitter, but never sooner than the server asked for
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _send_with_retries(self, send):
+        attempt = 0
+        while True:
+            with self._lock:
+                self._requests += 1
+            try:
+                response = send()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    with self._lock:
+                        self._failures += 1
+                    raise
+                retry_after = None
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                response.close()
+
+            with self._lock:
+                self._retries += 1
+            time.sleep(self._backoff(attempt, retry_after))
+            attempt += 1
+
+    def post_audio(self, audio_file, data=None):
+        """
+        Upload an audio file for transcription, retrying transient failures.
+
+        Args:
+            audio_file: A seekable file-like object with a ``name`` attribute
+            data (dict): Extra form fields for the request
+
+        Returns:
+            requests.Response: The final response, successful or not
+        """
+        mime_type = mimetypes.guess_type(audio_file.name)[0] or "application/octet-stream"
+
+        def send():
+            audio_file.seek(0)
+            boundary = uuid.uuid4().hex
+            headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+            body = MultipartBody(boundary, os.path.basename(audio_file.name), mime_type, audio_file, data)
+            started = time.monotonic()
+            response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+            response.upload_seconds = body.sent_at - started if body.sent_at is not None else None
+            return response
+
+        return self._send_with_retries(send)
+
+    def post_stream(self, filename, make_blocks, data=None):
+        """
+        Upload audio produced on the fly as a chunked multipart body.
+
+        Args:
+            filename (str): File name reported to the API
+            make_blocks: Callable returning a fresh iterator of audio blocks,
+                called once per attempt
+            data (dict): Extra form fields for the request
+
+        Returns:
+            requests.Response: The final response, successful or not
+        """
+        mime_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        def send():
+            boundary = uuid.uuid4().hex
+            headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+            sent_at = []
+
+            def body():
+                yield from iter_multipart(boundary, filename, mime_type, make_blocks(), data)
+                sent_at.append(time.monotonic())
+
+            started = time.monotonic()
+            response = self.session.post(self.url, data=body(), headers=headers, timeout=self.timeout)
+            response.upload_seconds = sent_at[0] - started if sent_at else None
+            return response
+
+        return self._send_with_retries(send)
+
+    def stats(self):
+        """
+        Snapshot of request, retry and connection reuse counters.
+
+        Returns:
+            dict: Counter name to value
+        """
+        opened = 0
+        served = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            served += pool.num_requests
+
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "retries": self._retries,
+                "failures": self._failures,
+                "connections_opened": opened,
+                "connections_reused": max(served - opened, 0)
+            }